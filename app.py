@@ -16,24 +16,40 @@ if sys.platform == 'win32' and sys.stdout is not None:
         pass
 
 from PySide6.QtWidgets import QApplication, QMenu, QSystemTrayIcon
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QIcon, QPixmap, QPainter, QColor
 
 from components import (
     CookieManager, SettingsManager, DataManager,
-    ScheduleWidget, LoginWindow
+    ScheduleWidget, create_storage, ScheduleArchive, RenderCache
 )
 
 
 def main():
+    # QtWebEngine (LoginWindow) chỉ được import khi cần đăng nhập, sau khi đã có QApplication
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setApplicationName("IUH Schedule Widget")
     app.setQuitOnLastWindowClosed(False)
     
     # Managers
-    data_manager = DataManager()
-    cookie_manager = CookieManager()
     settings_manager = SettingsManager()
+    data_manager = DataManager(create_storage(settings_manager.settings), ScheduleArchive(),
+                               RenderCache(), defer_load=True)
+    cookie_manager = CookieManager()
+    
+    def load_data():
+        data_manager.load()
+        # Chuyển các tuần cũ vào archive để file dữ liệu không lớn dần theo từng học kỳ
+        data_manager.apply_retention(settings_manager.settings.get('retention_weeks'))
+    
+    # Có ảnh chụp tuần này (render cache): vẽ widget từ đó trước, load toàn bộ dữ liệu sau lần vẽ đầu
+    from_cache = data_manager.load_render_cache()
+    if not from_cache:
+        load_data()
+    
+    # Ghi nốt dữ liệu đang chờ trước khi thoát
+    app.aboutToQuit.connect(data_manager.flush)
     
     # Widget
     widget = ScheduleWidget(data_manager, cookie_manager, settings_manager)
@@ -91,25 +107,35 @@ def main():
     tray.show()
     
     # Kiểm tra dữ liệu từ JSON
-    has_data = bool(data_manager.schedule or data_manager.tasks)
+    has_data = from_cache or data_manager.has_data()
     
     if has_data:
         widget.show()
         
+        if from_cache:
+            # Vẽ xong các ô từ ảnh chụp rồi mới load dữ liệu thật (các ô cập nhật qua data_changed)
+            app.processEvents()
+            def load_after_paint():
+                load_data()
+                if not data_manager.has_data():
+                    widget.open_login()
+            QTimer.singleShot(0, load_after_paint)
+        else:
+            # Ảnh chụp cho lần khởi động sau (chưa có hoặc đã sang tuần mới)
+            data_manager.write_render_cache()
+        
         # Gắn vào Progman sau 500ms
         QTimer.singleShot(500, widget._attach_to_desktop)
         
         # Auto refresh if has cookies
         if cookie_manager.has_cookies():
             QTimer.singleShot(2000, widget.refresh_schedule)
+            QTimer.singleShot(5000, widget.prefetch_weeks)
     else:
         if cookie_manager.has_cookies():
-            login = LoginWindow(data_manager, cookie_manager, widget.show_widget, auto_mode=True)
-            login.login_required.connect(widget.on_login_required)
-            login.show()
+            widget.login_session().open(widget.on_login_done, auto_mode=True)
         else:
-            login = LoginWindow(data_manager, cookie_manager, widget.show_widget)
-            login.show()
+            widget.open_login()
     
     sys.exit(app.exec())
 
@@ -0,0 +1,104 @@
+"""
+Benchmark thời gian import lúc khởi động (cold start), đo bằng python -X importtime
+
+Chạy:
+    python benchmarks/bench_import.py                  # đo `import app` (mọi module app.py cần trước khi hiện widget)
+    python benchmarks/bench_import.py --top 20         # in 20 module tốn thời gian nhất
+    python benchmarks/bench_import.py --max-ms 600     # exit 1 nếu tổng thời gian import vượt ngưỡng
+
+Tùy chọn:
+    --rounds 5                 Số lần đo, mỗi lần 1 process Python mới, lấy lần nhanh nhất
+    --statement "import app"   Câu lệnh được đo
+
+Exit 1 nếu một module chỉ dùng khi cần (QtWebEngine, requests, winreg, login) bị import lúc khởi động.
+"""
+import sys
+import subprocess
+
+from common import ROOT
+
+# Module chỉ được load khi cần: đăng nhập bằng WebEngine, fetch HTTP, ghi registry
+DEFERRED_MODULES = (
+    'PySide6.QtWebEngineWidgets',
+    'PySide6.QtWebEngineCore',
+    'components.login',
+    'requests',
+    'winreg',
+)
+
+
+def measure(statement):
+    """Chạy statement trong process mới với -X importtime
+
+    Returns:
+        (tổng ms, list (cumulative ms, self ms, tên module))
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, capture_output=True, text=True, encoding='utf-8', errors='replace',
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import lỗi')
+    modules = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Module được import trực tiếp (không thụt lề) - cộng lại thành tổng
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative_us)
+        modules.append((int(cumulative_us) / 1000, int(self_us) / 1000, name.strip()))
+    return total_us / 1000, modules
+
+
+def parse_args(args):
+    options = {'rounds': 5, 'top': 10, 'max_ms': None, 'statement': 'import app'}
+    it = iter(args)
+    for arg in it:
+        if arg == '--rounds':
+            options['rounds'] = int(next(it))
+        elif arg == '--top':
+            options['top'] = int(next(it))
+        elif arg == '--max-ms':
+            options['max_ms'] = float(next(it))
+        elif arg == '--statement':
+            options['statement'] = next(it)
+    return options
+
+
+def main(args):
+    options = parse_args(args)
+    best = None
+    for _ in range(options['rounds']):
+        try:
+            total_ms, modules = measure(options['statement'])
+        except RuntimeError as e:
+            print(f"❌ Không chạy được `{options['statement']}`: {e}")
+            return 1
+        if best is None or total_ms < best[0]:
+            best = (total_ms, modules)
+    total_ms, modules = best
+
+    print(f"`{options['statement']}`: {total_ms:.1f} ms ({len(modules)} module, tốt nhất {options['rounds']} lần)")
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_ms, self_ms, name in sorted(modules, reverse=True)[:options['top']]:
+        print(f"{cumulative_ms:>14.1f}{self_ms:>10.1f}  {name}")
+
+    failed = False
+    names = {name for _, _, name in modules}
+    deferred = [name for name in DEFERRED_MODULES if name in names]
+    if deferred:
+        print(f"\n❌ Bị import lúc khởi động (nên import khi cần): {', '.join(deferred)}")
+        failed = True
+    if options['max_ms'] is not None and total_ms > options['max_ms']:
+        print(f"\n❌ Tổng thời gian import {total_ms:.1f} ms > ngưỡng {options['max_ms']:.0f} ms")
+        failed = True
+    if not failed:
+        print("\n✅ Không có module nặng nào bị import lúc khởi động")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+"""
+Benchmark: So sánh parser 1 lượt (components/parser.py) với chuỗi regex cũ trên các trang lịch đã lưu
+
+Chạy:
+    python benchmarks/bench_parser.py [file.html ...]
+
+Mặc định dùng các file trong benchmarks/fixtures/. Có thể truyền thêm trang lịch thật đã lưu
+(Ctrl+S trên sv.iuh.edu.vn/lich-theo-tuan.html) - không commit trang thật vì chứa thông tin cá nhân.
+"""
+import os
+import re
+import sys
+import timeit
+from datetime import datetime
+
+from common import FIXTURES_DIR, load_component, fixture_names
+
+
+def legacy_parse_week_dates(html):
+    """Bản cũ của DataManager._parse_week_dates_from_html (baseline)"""
+    rows = re.findall(r'<tr[^>]*>(.*?)</tr>', html, re.DOTALL)
+    for row in rows[:5]:
+        cells = re.findall(r'<th[^>]*>(.*?)</th>', row, re.DOTALL)
+        if len(cells) < 7:
+            continue
+        week_dates = {}
+        for idx, cell in enumerate(cells):
+            cell_text = re.sub(r'<[^>]+>', ' ', cell).strip()
+            cell_text = re.sub(r'\s+', ' ', cell_text)
+            date_match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', cell_text)
+            if date_match:
+                year = date_match.group(3)
+            else:
+                date_match = re.search(r'(\d{1,2})/(\d{1,2})', cell_text)
+                if not date_match:
+                    continue
+                year = datetime.now().year
+                if int(date_match.group(2)) < datetime.now().month and datetime.now().month >= 10:
+                    year += 1
+            if idx > 0:
+                week_dates[idx - 1] = f"{date_match.group(1).zfill(2)}/{date_match.group(2).zfill(2)}/{year}"
+        if len(week_dates) >= 7:
+            return week_dates
+    return None
+
+
+def legacy_parse(html):
+    """Bản cũ của DataManager.parse_schedule_html (baseline, chỉ phần parse)"""
+    week_dates = legacy_parse_week_dates(html)
+    if len(html) < 5000:
+        return []
+    error_patterns = ['<title>404', '<title>500', 'page not found', 'server error', '503 service']
+    if any(pattern in html.lower() for pattern in error_patterns):
+        return []
+
+    table_html = None
+    table_match = re.search(r'<table[^>]*>(.*?)</table>', html, re.DOTALL | re.IGNORECASE)
+    if table_match and len(table_match.group(1)) >= 1000:
+        table_html = table_match.group(1)
+    else:
+        for tbl in re.findall(r'<table[^>]*>(.*?)</table>', html, re.DOTALL | re.IGNORECASE):
+            if ('đứ' in tbl.lower() or 'sáng' in tbl.lower() or 'chiều' in tbl.lower()) and len(tbl) > 1000:
+                table_html = tbl
+                break
+    if table_html is None:
+        return []
+
+    items = []
+    for row_html in re.findall(r'<tr[^>]*>(.*?)</tr>', table_html, re.DOTALL):
+        cells = re.findall(r'<td[^>]*>(.*?)</td>', row_html, re.DOTALL)
+        if len(cells) < 2:
+            continue
+        first_cell_text = re.sub(r'<[^>]+>', '', cells[0]).strip()
+        period = -1
+        if 'Sáng' in first_cell_text:
+            period = 0
+        elif 'Chiều' in first_cell_text:
+            period = 1
+        elif 'Tối' in first_cell_text:
+            period = 2
+        if period == -1:
+            continue
+
+        for day_idx in range(7):
+            if day_idx + 1 >= len(cells):
+                break
+            cell_html = cells[day_idx + 1]
+            cell_text = re.sub(r'\s+', ' ', re.sub(r'<[^>]+>', ' ', cell_html).strip())
+            if not cell_text or len(cell_text) < 15:
+                continue
+            cell_clean = re.sub(r'<[^>]+>', '\n', cell_html)
+            lines = [l.strip() for l in cell_clean.split('\n') if l.strip()]
+
+            subject_names = []
+            for line in lines:
+                if re.match(r'^DH[A-Z0-9]+', line):
+                    continue
+                if re.match(r'^[\d\s\-–]+$', line):
+                    continue
+                if len(line) < 10:
+                    continue
+                if re.match(r'^(Tiết|Phòng|GV|Giảng viên)\s*:', line, re.IGNORECASE):
+                    continue
+                if re.match(r'^[A-Z]\d+\.', line) or re.match(r'^[A-Z]\d+\.\d+', line):
+                    continue
+                words = line.split()
+                if len(words) <= 4 and all(w[0].isupper() for w in words if w):
+                    if not any(kw in line.lower() for kw in ['học', 'trình', 'liệu', 'nghệ', 'trúc', 'nhập', 'môn', 'quản', 'phát', 'triển', 'cntt', 'dự án']):
+                        continue
+                subject_names.append(line)
+
+            tiet_matches = list(re.finditer(r'Tiết\s*:\s*(\d+)\s*[-–]\s*(\d+)', cell_clean))
+            if not tiet_matches:
+                continue
+            phong_matches = list(re.finditer(r'Phòng\s*:\s*([A-Z0-9][A-Za-z0-9\.]*)', cell_clean))
+
+            for idx, tiet_match in enumerate(tiet_matches):
+                tiet_str = f"{tiet_match.group(1)}-{tiet_match.group(2)}"
+                if idx < len(subject_names):
+                    subject_name = subject_names[idx]
+                else:
+                    subject_name = subject_names[-1] if subject_names else "Môn học"
+                item = {
+                    'raw': f"{subject_name} Tiết:{tiet_str}"[:200],
+                    'day': day_idx,
+                    'period': period,
+                    'subject': subject_name[:60],
+                    'tiet': tiet_str
+                }
+                if week_dates and day_idx in week_dates:
+                    item['date'] = week_dates[day_idx]
+                if idx < len(phong_matches):
+                    item['room'] = phong_matches[idx].group(1)
+                items.append(item)
+    return items
+
+
+def bench(func, html, number):
+    """Thời gian trung bình (ms) của 1 lần gọi, lấy min của 5 lần đo"""
+    return min(timeit.repeat(lambda: func(html), number=number, repeat=5)) / number * 1000
+
+
+def main(paths):
+    parser = load_component('parser')
+
+    def new_parse(html):
+        return parser.parse_schedule(html)[0]
+
+    if not paths:
+        paths = [os.path.join(FIXTURES_DIR, name) for name in fixture_names()]
+
+    print(f"{'file':<28}{'size':>9}{'items':>7}{'regex ms':>11}{'1-pass ms':>11}{'speedup':>9}  same")
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        old_items = legacy_parse(html)
+        new_items = new_parse(html)
+        number = 200
+        old_ms = bench(legacy_parse, html, number)
+        new_ms = bench(new_parse, html, number)
+        print(f"{os.path.basename(path):<28}{len(html):>9}{len(new_items):>7}"
+              f"{old_ms:>11.3f}{new_ms:>11.3f}{old_ms / new_ms:>8.1f}x  {old_items == new_items}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
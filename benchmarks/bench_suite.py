@@ -0,0 +1,257 @@
+"""
+Benchmark suite offline: parse, tra cứu ô, lưu dữ liệu, lần vẽ đầu và bộ nhớ - không cần đăng nhập IUH
+
+Chạy:
+    python benchmarks/bench_suite.py                         # đo và in kết quả
+    python benchmarks/bench_suite.py --save-baseline NAME    # lưu kết quả vào baselines/NAME.json
+    python benchmarks/bench_suite.py --compare NAME          # so với baseline, exit 1 nếu chậm hơn ngưỡng
+
+Tùy chọn:
+    --years 1,3,5        Số năm dữ liệu giả lập cho phần tra cứu/lưu
+    --threshold 0.25     Chậm hơn baseline bao nhiêu (25%) thì tính là regression
+    --rounds 3           Số vòng chạy cả suite, mỗi metric lấy giá trị tốt nhất
+
+Trước khi đo, kết quả parse của mỗi trang mẫu được so với fixtures/*.expected.json (regression corpus)
+và chạy các check mất dữ liệu của storage lazy (check_lazy_weeks.py).
+Baseline phụ thuộc máy - nên lưu baseline riêng trên máy của mình trước khi sửa code rồi --compare sau khi sửa.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import timeit
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import BASELINES_DIR, load_component, read_fixture, fixture_names
+from check_lazy_weeks import check_lazy_weeks
+from make_fixtures import make_schedule_data, expected_path, parse_for_expected
+
+# Thứ 2 đầu tiên của dữ liệu giả lập
+DATA_START = datetime(2022, 8, 29)
+
+
+def best_of(func, number, repeat=9):
+    """Thời gian (ms) của 1 lần gọi, lấy min của các lần đo"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+def calibrate():
+    """Thời gian (ms) của 1 tác vụ Python cố định - dùng để quy đổi kết quả giữa các lần chạy/máy"""
+    def work():
+        data = {}
+        for i in range(20000):
+            data[f'k{i % 500}'] = data.get(f'k{i % 500}', 0) + i
+        return sorted(data.values())
+    return best_of(work, 5)
+
+
+def peak_kb(func):
+    """Bộ nhớ cấp phát tối đa (KB) trong lúc chạy func"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def check_corpus(parser):
+    """So kết quả parse với .expected.json, trả về list tên trang bị sai"""
+    failed = []
+    for name in fixture_names():
+        with open(expected_path(name), 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+        if parse_for_expected(parser, read_fixture(name)) != expected:
+            failed.append(name)
+    return failed
+
+
+def bench_parse(parser, managers, storage, tmp_dir, results):
+    # Cache parse riêng, không đụng parse_cache.json của app
+    parser.parse_cache = parser.ParseCache(os.path.join(tmp_dir, 'parse_cache.json'))
+    for name in fixture_names():
+        html = read_fixture(name)
+        key = name[:-len('.html')]
+        results[f'parse.{key}.ms'] = best_of(lambda: parser.parse_schedule(html), 50)
+        results[f'parse_week_dates.{key}.ms'] = best_of(lambda: parser.parse_week_dates(html), 50)
+        results[f'parse.{key}.peak_kb'] = peak_kb(lambda: parser.parse_schedule(html))
+
+    # Toàn bộ đường đi của DataManager.parse_schedule_html (cache hit + merge + index)
+    html = read_fixture('week_normal.html')
+    dm = managers.DataManager(storage.JsonStorage(os.path.join(tmp_dir, 'parse_dm.json')))
+    dm.parse_schedule_html(html, auto_save=False, merge_mode=True)
+    results['parse_schedule_html.merge.ms'] = best_of(
+        lambda: dm.parse_schedule_html(html, auto_save=False, merge_mode=True), 20)
+
+
+def bench_data(managers, storage, render_cache, tmp_dir, years, results):
+    data_file = os.path.join(tmp_dir, f'schedule_{years}y.json')
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(make_schedule_data(years, start=DATA_START), f, ensure_ascii=False, separators=(',', ':'))
+    key = f'{years}y'
+    results[f'data.{key}.file_kb'] = os.path.getsize(data_file) / 1024
+
+    holder = {}
+
+    def load():
+        holder['dm'] = managers.DataManager(storage.JsonStorage(data_file))
+
+    results[f'load.{key}.ms'] = best_of(load, 1, repeat=3)
+    results[f'load.{key}.peak_kb'] = peak_kb(load)
+    dm = holder['dm']
+
+    # Tra cứu các tuần ngẫu nhiên trong khoảng dữ liệu
+    rng = random.Random(3)
+    today = datetime.now()
+    this_monday = today - timedelta(days=today.weekday())
+    first_offset = (DATA_START - this_monday).days // 7 + 1
+    week_offsets = [first_offset + rng.randint(0, int(years * 52) - 1) for _ in range(50)]
+    weeks = [dm.get_week_dates_from_offset(offset) for offset in week_offsets]
+    cells = [(rng.randint(0, 6), rng.randint(0, 2), week) for week in weeks]
+
+    def lookup_cells():
+        for day, period, week in cells:
+            dm.get_items_for_cell(day, period, week)
+
+    def lookup_weeks():
+        for week in weeks:
+            dm.get_week(week)
+
+    results[f'lookup_cell.{key}.us'] = best_of(lookup_cells, 20) * 1000 / len(cells)
+    results[f'lookup_week.{key}.us'] = best_of(lookup_weeks, 20) * 1000 / len(weeks)
+
+    def save():
+        dm._write_snapshot()
+        dm.storage.flush()
+
+    results[f'save.{key}.ms'] = best_of(save, 3)
+    results[f'save.{key}.peak_kb'] = peak_kb(save)
+
+    # Lần vẽ đầu lúc khởi động: đọc render cache của tuần này, chưa load dữ liệu
+    cache = render_cache.RenderCache(os.path.join(tmp_dir, f'render_cache_{years}y.json'))
+    dm.render_cache = cache
+    dm.write_render_cache()
+    cache.flush()
+
+    def first_paint():
+        first = managers.DataManager(storage.JsonStorage(data_file), render_cache=cache, defer_load=True)
+        first.load_render_cache()
+        first.get_week(first.get_week_dates_from_offset(0))
+
+    results[f'first_paint.{key}.ms'] = best_of(first_paint, 20)
+
+
+def compare(results, baseline, threshold):
+    """In so sánh với baseline, trả về list metric chậm/tốn hơn ngưỡng (mọi metric: càng nhỏ càng tốt)
+
+    Metric thời gian được quy đổi theo calibration.ms để bớt nhiễu do tốc độ máy lúc đo.
+    """
+    base_results = baseline.get('results', {})
+    scale = 1.0
+    if base_results.get('calibration.ms') and results.get('calibration.ms'):
+        scale = base_results['calibration.ms'] / results['calibration.ms']
+    print(f"\n(thời gian đã quy đổi theo calibration, hệ số {scale:.2f})")
+    regressions = []
+    print(f"\n{'metric':<40}{'baseline':>12}{'now':>12}{'change':>9}")
+    for metric, value in results.items():
+        base = base_results.get(metric)
+        if not isinstance(base, (int, float)) or metric.endswith('file_kb') or metric.startswith('calibration'):
+            continue
+        if metric.endswith(('.ms', '.us')):
+            value *= scale
+        change = (value - base) / base if base else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  ⚠️'
+            regressions.append(metric)
+        print(f"{metric:<40}{base:>12.3f}{value:>12.3f}{change:>+8.0%}{flag}")
+    return regressions
+
+
+def parse_args(args):
+    options = {'years': [1, 3, 5], 'threshold': 0.25, 'rounds': 3, 'save': None, 'compare': None}
+    it = iter(args)
+    for arg in it:
+        if arg == '--years':
+            options['years'] = [float(y) if '.' in y else int(y) for y in next(it).split(',')]
+        elif arg == '--threshold':
+            options['threshold'] = float(next(it))
+        elif arg == '--rounds':
+            options['rounds'] = int(next(it))
+        elif arg == '--save-baseline':
+            options['save'] = next(it)
+        elif arg == '--compare':
+            options['compare'] = next(it)
+    return options
+
+
+def main(args):
+    options = parse_args(args)
+
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    parser = load_component('parser')
+    storage = load_component('storage')
+    managers = load_component('managers')
+    render_cache = load_component('render_cache')
+
+    failed = check_corpus(parser)
+    if failed:
+        print(f"❌ Kết quả parse khác fixtures/*.expected.json: {', '.join(failed)}")
+        return 1
+    print(f"✅ Regression corpus: {len(fixture_names())} trang khớp kết quả mong đợi")
+    failed = check_lazy_weeks(managers, storage, render_cache)
+    if failed:
+        print(f"❌ Storage lazy mất dữ liệu khi bỏ tuần khỏi bộ nhớ: {', '.join(failed)}")
+        return 1
+    print("✅ Storage lazy: không mất dữ liệu khi bỏ tuần khỏi bộ nhớ")
+
+    # Chạy cả suite nhiều vòng, mỗi metric lấy giá trị nhỏ nhất để bớt nhiễu
+    results = {}
+    for _ in range(options['rounds']):
+        round_results = {'calibration.ms': calibrate()}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bench_parse(parser, managers, storage, tmp_dir, round_results)
+            for years in options['years']:
+                bench_data(managers, storage, render_cache, tmp_dir, years, round_results)
+        for metric, value in round_results.items():
+            results[metric] = min(value, results.get(metric, value))
+
+    print(f"\n{'metric':<40}{'value':>12}")
+    for metric, value in results.items():
+        print(f"{metric:<40}{value:>12.3f}")
+
+    if options['save']:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f"{options['save']}.json")
+        baseline = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=1)
+        print(f"\n💾 Đã lưu baseline: {path}")
+
+    if options['compare']:
+        path = os.path.join(BASELINES_DIR, f"{options['compare']}.json")
+        with open(path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, options['threshold'])
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric chậm hơn baseline quá {options['threshold']:.0%}")
+            return 1
+        print(f"\n✅ Không có metric nào chậm hơn baseline quá {options['threshold']:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
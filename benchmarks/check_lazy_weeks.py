@@ -0,0 +1,124 @@
+"""
+Regression check: storage lazy ('weeks', 'sqlite') không được mất dữ liệu khi bỏ tuần khỏi bộ nhớ (LRU)
+
+Chạy:
+    python benchmarks/check_lazy_weeks.py
+
+bench_suite.py cũng chạy các check này trước khi đo (như regression corpus). Mỗi check dựng
+DataManager trên thư mục tạm, làm đúng chuỗi thao tác từng gây mất dữ liệu rồi load lại từ đĩa để so.
+Exit 1 nếu có check sai.
+"""
+import os
+import sys
+import tempfile
+
+from common import load_component
+
+SUBJECTS = ('Cấu trúc dữ liệu', 'Mạng máy tính', 'Hệ điều hành')
+
+
+def week_items(week_dates, count=3):
+    """Vài môn học (dict như kết quả parse) rải trong tuần week_dates"""
+    items = []
+    for i in range(count):
+        day, period = (i * 2) % 7, i % 3
+        subject, tiet = SUBJECTS[i % len(SUBJECTS)], f"{1 + period * 6}-{3 + period * 6}"
+        items.append({'raw': f"{subject} Tiết:{tiet}", 'day': day, 'period': period, 'subject': subject,
+                      'tiet': tiet, 'date': week_dates[day], 'room': f"A{i}.01"})
+    return items
+
+
+def count_items(week):
+    return sum(len(items) for periods in week for items in periods)
+
+
+def reload_counts(managers, make_storage, offsets):
+    """Số item của từng tuần khi load lại từ đĩa bằng DataManager mới"""
+    dm = managers.DataManager(make_storage())
+    return {offset: count_items(dm.get_week(dm.get_week_dates_from_offset(offset))) for offset in offsets}
+
+
+def check_prefetch_window(managers, storage, tmp_dir):
+    """Merge 11 tuần liên tiếp (-2..+8, nhiều hơn LOADED_WEEKS_MAX) rồi lưu 1 lần như prefetch"""
+    weeks_dir = os.path.join(tmp_dir, 'weeks')
+    make_storage = lambda: storage.WeekFileStorage(weeks_dir, json_file=os.path.join(tmp_dir, 'none.json'))
+    dm = managers.DataManager(make_storage())
+    offsets = range(-2, 9)
+    for offset in offsets:
+        week_dates = dm.get_week_dates_from_offset(offset)
+        dm.merge_week(week_items(week_dates), week_dates.values())
+    dm.save()
+    dm.flush()
+    counts = reload_counts(managers, make_storage, offsets)
+    return all(count == 3 for count in counts.values())
+
+
+def check_displayed_week_task(managers, storage, tmp_dir):
+    """Tuần đang hiện bị đẩy khỏi LRU bởi các tuần khác, sau đó thêm task vào tuần đó"""
+    weeks_dir = os.path.join(tmp_dir, 'weeks')
+    make_storage = lambda: storage.WeekFileStorage(weeks_dir, json_file=os.path.join(tmp_dir, 'none.json'))
+    dm = managers.DataManager(make_storage())
+    shown = dm.get_week_dates_from_offset(3)
+    dm.merge_week(week_items(shown), shown.values())
+    dm.save()
+    dm.flush()
+
+    dm = managers.DataManager(make_storage())
+    dm.set_visible_week(shown)
+    dm.get_week(shown)
+    for offset in range(10, 10 + managers.LOADED_WEEKS_MAX + 2):
+        dm.get_week(dm.get_week_dates_from_offset(offset))
+    dm.add_task('Nộp báo cáo', 1, 0, date=shown[1])
+    dm.flush()
+    return reload_counts(managers, make_storage, [3]) == {3: 4}
+
+
+def check_render_cache_after_evict(managers, storage, render_cache, tmp_dir):
+    """SQLite: tuần này bị đẩy khỏi LRU khi còn thay đổi chưa ghi, rồi lưu (ghi render cache)"""
+    make_storage = lambda: storage.SqliteStorage(os.path.join(tmp_dir, 'data.db'),
+                                                 json_file=os.path.join(tmp_dir, 'none.json'))
+    cache = render_cache.RenderCache(os.path.join(tmp_dir, 'render_cache.json'))
+    dm = managers.DataManager(make_storage(), render_cache=cache)
+    this_week = dm.get_week_dates_from_offset(0)
+    dm.merge_week(week_items(this_week), this_week.values())
+    for offset in range(1, managers.LOADED_WEEKS_MAX + 3):
+        week_dates = dm.get_week_dates_from_offset(offset)
+        dm.merge_week(week_items(week_dates), week_dates.values())
+    dm.save()
+    dm.flush()
+    cached = cache.load(this_week)
+    return (count_items(dm.get_week(this_week)) == 3 and cached is not None and count_items(cached) == 3
+            and reload_counts(managers, make_storage, [0]) == {0: 3})
+
+
+def check_lazy_weeks(managers, storage, render_cache):
+    """Chạy các check, trả về list tên check bị sai"""
+    checks = {
+        'prefetch_window': lambda tmp_dir: check_prefetch_window(managers, storage, tmp_dir),
+        'displayed_week_task': lambda tmp_dir: check_displayed_week_task(managers, storage, tmp_dir),
+        'render_cache_after_evict': lambda tmp_dir: check_render_cache_after_evict(
+            managers, storage, render_cache, tmp_dir),
+    }
+    failed = []
+    for name, check in checks.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if not check(tmp_dir):
+                failed.append(name)
+    return failed
+
+
+def main():
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    failed = check_lazy_weeks(load_component('managers'), load_component('storage'),
+                              load_component('render_cache'))
+    if failed:
+        print(f"❌ Storage lazy mất dữ liệu khi bỏ tuần khỏi bộ nhớ: {', '.join(failed)}")
+        return 1
+    print("✅ Storage lazy: không mất dữ liệu khi bỏ tuần khỏi bộ nhớ")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Tiện ích dùng chung cho các benchmark
+"""
+import os
+import sys
+import types
+import importlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+
+
+def load_component(name):
+    """Import components.<name> mà không chạy components/__init__ (không kéo theo widgets/WebEngine)"""
+    if 'components' not in sys.modules:
+        package = types.ModuleType('components')
+        package.__path__ = [os.path.join(ROOT, 'components')]
+        sys.modules['components'] = package
+    return importlib.import_module(f'components.{name}')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def fixture_names():
+    """Tên các trang HTML mẫu trong fixtures/ (theo thứ tự tên)"""
+    return sorted(n for n in os.listdir(FIXTURES_DIR) if n.endswith('.html'))
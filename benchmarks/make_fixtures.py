@@ -0,0 +1,159 @@
+"""
+Tạo các trang lịch mẫu (đã ẩn danh) và dữ liệu lịch nhiều năm cho benchmark
+
+Chạy:
+    python benchmarks/make_fixtures.py             # tạo lại fixtures/*.html
+    python benchmarks/make_fixtures.py --expected  # cập nhật fixtures/*.expected.json từ parser hiện tại
+
+Trang mẫu mô phỏng bố cục sv.iuh.edu.vn/lich-theo-tuan.html (menu, script, bảng lịch 7 ngày x 3 ca),
+tên người/mã lớp là giả. Seed cố định nên chạy lại cho ra đúng các file đã commit.
+"""
+import os
+import sys
+import json
+import random
+from datetime import datetime, timedelta
+
+from common import FIXTURES_DIR, load_component, read_fixture, fixture_names
+
+DAYS = ['Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7', 'Chủ nhật']
+SUBJECTS = [
+    'Lập trình hướng đối tượng', 'Cơ sở dữ liệu', 'Kiến trúc máy tính', 'Nhập môn dữ liệu lớn',
+    'Phát triển ứng dụng web', 'Quản trị hệ thống mạng', 'Công nghệ phần mềm',
+    'Kiến trúc và Thiết kế Phần mềm', 'Quản lý dự án CNTT', 'Lập trình phân tích dữ liệu 1',
+]
+TEACHERS = ['Nguyễn Văn A', 'Trần Thị B', 'Lê Văn C', 'Phạm Thị D']
+PERIODS = [('Sáng', 1), ('Chiều', 7), ('Tối', 13)]
+
+
+def _room(rng):
+    return f"{rng.choice('ABCHV')}{rng.randint(1, 14)}.{rng.randint(1, 9):02d}"
+
+
+def _class_block(rng, subject, tiet_from, label_teacher='GV'):
+    return (f'<div class="content color-lichhoc" data-toggle="tooltip">'
+            f'<b><a href="#">{subject}</a></b>'
+            f'<p>DHKTPM{rng.randint(16, 19)}{rng.choice("ABC")} - 420300{rng.randint(100, 999)}</p>'
+            f'<p>Tiết: {tiet_from} - {tiet_from + 2}</p>'
+            f'<p>Phòng: {_room(rng)}</p>'
+            f'<p>{label_teacher}: {rng.choice(TEACHERS)}</p></div>')
+
+
+def portal_page(rng, monday, classes_per_cell, title='Lịch theo tuần', script_lines=400):
+    """Trang lịch theo tuần đầy đủ
+
+    Args:
+        classes_per_cell: Hàm (period_idx) -> số lớp trong 1 ô
+    """
+    out = [f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>']
+    out.append('<script type="text/javascript">' + 'var menu = {a: 1, b: [1,2,3]};\n' * script_lines + '</script>')
+    out.append('<link rel="stylesheet" href="/Content/site.css"></head><body>')
+    out.append('<nav class="navbar"><ul>' + ''.join(f'<li><a href="/m{i}.html">Mục {i}</a></li>' for i in range(40)) + '</ul></nav>')
+    out.append('<!-- <table><tr><td>Sáng</td><td>bảng cũ đã comment</td></tr></table> -->')
+    out.append('<div class="box"><table class="fl-table table table-bordered text-center" id="tbl"><thead><tr><th>Ca học</th>')
+    for idx, day in enumerate(DAYS):
+        date = (monday + timedelta(days=idx)).strftime('%d/%m/%Y')
+        out.append(f'<th><span>{day}</span><br>{date}</th>')
+    out.append('</tr></thead><tbody>')
+    for period_idx, (name, tiet_from) in enumerate(PERIODS):
+        out.append(f'<tr><td><b>{name}</b></td>')
+        for day in range(7):
+            n = classes_per_cell(period_idx)
+            body = ''.join(_class_block(rng, rng.choice(SUBJECTS), tiet_from + 3 * k if k < 2 else tiet_from)
+                           for k in range(n))
+            out.append(f'<td>{body}</td>')
+        out.append('</tr>')
+    out.append('</tbody></table></div>')
+    out.append('<footer><table><tr><td>Liên hệ</td><td>Địa chỉ: 12 Nguyễn Văn Bảo</td></tr></table></footer></body></html>')
+    return '\n'.join(out)
+
+
+def make_pages():
+    """Dict {tên file: html} của các trang mẫu"""
+    rng = random.Random(7)
+    monday = datetime(2026, 1, 26)
+    pages = {}
+    pages['week_normal.html'] = portal_page(
+        rng, monday, lambda p: rng.choice([0, 1, 1, 2]) if p < 2 else rng.choice([0, 0, 1]))
+    pages['week_empty.html'] = portal_page(rng, monday + timedelta(weeks=1), lambda p: 0)
+    pages['week_multi_class.html'] = portal_page(rng, monday + timedelta(weeks=2), lambda p: rng.choice([2, 3]))
+    pages['week_night.html'] = portal_page(rng, monday + timedelta(weeks=3), lambda p: 1 if p == 2 else 0)
+    pages['error_page.html'] = (
+        '<!DOCTYPE html><html><head><title>500 - Internal server error.</title>'
+        '<script>' + 'var x = 1;\n' * 600 + '</script></head><body>'
+        '<h1>Server Error</h1><p>There is a problem with the resource you are looking for.</p></body></html>')
+    return pages
+
+
+def make_schedule_data(years, seed=1, start=datetime(2022, 8, 29), tasks_per_week=3):
+    """Dữ liệu schedule_data.json giả lập nhiều năm (format theo tuần)"""
+    rng = random.Random(seed)
+    data = {}
+    task_id = 1
+    for week in range(int(years * 52)):
+        monday = start + timedelta(weeks=week)
+        block = {'schedule': [], 'tasks': []}
+        for _ in range(rng.randint(8, 20)):
+            day = rng.randint(0, 6)
+            period = rng.choice([0, 0, 1, 1, 2])
+            tiet_from = PERIODS[period][1] + rng.choice([0, 3])
+            subject = rng.choice(SUBJECTS)
+            tiet = f"{tiet_from}-{tiet_from + 2}"
+            block['schedule'].append({
+                'raw': f"{subject} Tiết:{tiet}",
+                'day': day,
+                'period': period,
+                'subject': subject,
+                'tiet': tiet,
+                'date': (monday + timedelta(days=day)).strftime('%d/%m/%Y'),
+                'room': _room(rng),
+            })
+        for _ in range(tasks_per_week):
+            day = rng.randint(0, 6)
+            block['tasks'].append({
+                'id': task_id,
+                'title': f'Bài tập {task_id}',
+                'day': day,
+                'period': rng.randint(0, 2),
+                'note': '',
+                'deadline': None,
+                'time': None,
+                'date': (monday + timedelta(days=day)).strftime('%d/%m/%Y'),
+                'done': rng.random() < 0.5,
+            })
+            task_id += 1
+        data[f"tuan{monday.strftime('%d/%m/%Y')}"] = block
+    data['updated'] = start.isoformat()
+    return data
+
+
+def expected_path(name):
+    return os.path.join(FIXTURES_DIR, name[:-len('.html')] + '.expected.json')
+
+
+def parse_for_expected(parser, html):
+    """Kết quả parse ở dạng lưu được trong .expected.json"""
+    items, week_dates = parser.parse_schedule(html)
+    return {'items': items, 'week_dates': {str(k): v for k, v in (week_dates or {}).items()}}
+
+
+def write_expected():
+    parser = load_component('parser')
+    for name in fixture_names():
+        with open(expected_path(name), 'w', encoding='utf-8') as f:
+            json.dump(parse_for_expected(parser, read_fixture(name)), f, ensure_ascii=False, indent=1)
+        print(f"✅ {expected_path(name)}")
+
+
+def main(args):
+    if '--expected' in args:
+        write_expected()
+        return
+    for name, html in make_pages().items():
+        with open(os.path.join(FIXTURES_DIR, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"✅ {name} ({len(html)} chars)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,6 +1,16 @@
 # IUH Schedule Widget Components
 from .constants import *
 from .managers import CookieManager, SettingsManager, DataManager
+from .storage import JsonStorage, JournalStorage, create_storage
+from .archive import ScheduleArchive
+from .render_cache import RenderCache
 from .dialogs import AddTaskDialog
 from .widgets import ScheduleCell, ScheduleWidget
-from .login import LoginWindow
+
+
+def __getattr__(name):
+    # LoginWindow kéo theo QtWebEngine (Chromium) - chỉ import khi được dùng tới
+    if name == 'LoginWindow':
+        from .login import LoginWindow
+        return LoginWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
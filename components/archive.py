@@ -0,0 +1,92 @@
+"""
+Archive: Lưu trữ các tuần cũ, mỗi học kỳ 1 file JSON nén gzip
+
+File dữ liệu chính chỉ giữ các tuần gần đây (settings['retention_weeks']), các tuần cũ hơn
+được DataManager.apply_retention() chuyển vào ARCHIVE_DIR/<năm học>_HK<n>.json.gz với cùng
+format theo tuần 'tuanDD/MM/YYYY' và chỉ được đọc lại khi xem các tuần đó.
+"""
+import os
+import gzip
+import json
+from collections import OrderedDict
+from datetime import date
+
+from .constants import ARCHIVE_DIR, ARCHIVE_CACHE_MAX
+from .storage import atomic_write_bytes, day_number
+
+
+def semester_of(day_num):
+    """Học kỳ chứa số ngày: '2025-2026_HK1' (tháng 8-12), '_HK2' (tháng 1-5), '_HK3' (hè, tháng 6-7)"""
+    d = date.fromordinal(day_num)
+    year = d.year if d.month >= 8 else d.year - 1
+    term = 1 if d.month >= 8 else 2 if d.month <= 5 else 3
+    return f"{year}-{year + 1}_HK{term}"
+
+
+class ScheduleArchive:
+    """Các file lưu trữ học kỳ trong ARCHIVE_DIR (đọc khi cần, giữ vài file gần nhất trong bộ nhớ)"""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        # Học kỳ -> dict tuần đã đọc, theo thứ tự LRU
+        self._cache = OrderedDict()
+
+    def _path(self, semester):
+        return os.path.join(self.archive_dir, f"{semester}.json.gz")
+
+    def _read(self, semester):
+        """Dict {'tuanDD/MM/YYYY': {'schedule', 'tasks'}} của 1 học kỳ ({} nếu chưa có file)"""
+        weeks = self._cache.get(semester)
+        if weeks is not None:
+            self._cache.move_to_end(semester)
+            return weeks
+        weeks = {}
+        try:
+            path = self._path(semester)
+            if os.path.exists(path):
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    weeks = json.load(f)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+        self._remember(semester, weeks)
+        return weeks
+
+    def _remember(self, semester, weeks):
+        self._cache[semester] = weeks
+        self._cache.move_to_end(semester)
+        while len(self._cache) > ARCHIVE_CACHE_MAX:
+            self._cache.popitem(last=False)
+
+    def add(self, blocks):
+        """Gộp các block tuần (format snapshot) vào file học kỳ tương ứng
+
+        Tuần đã có trong archive: lịch học lấy theo block mới (nếu có), tasks gộp theo id.
+        """
+        by_semester = {}
+        for week_key, block in blocks.items():
+            day_num = day_number(week_key[4:])
+            if day_num is not None:
+                by_semester.setdefault(semester_of(day_num), {})[week_key] = block
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for semester, new_weeks in by_semester.items():
+            weeks = dict(self._read(semester))
+            for week_key, block in new_weeks.items():
+                old = weeks.get(week_key, {})
+                tasks = {task.get('id'): task for task in old.get('tasks', []) + block.get('tasks', [])}
+                weeks[week_key] = {
+                    'schedule': block.get('schedule') or old.get('schedule', []),
+                    'tasks': list(tasks.values()),
+                }
+            text = json.dumps(weeks, ensure_ascii=False, separators=(',', ':'))
+            atomic_write_bytes(self._path(semester), gzip.compress(text.encode('utf-8')))
+            self._remember(semester, weeks)
+
+    def load_week(self, week_key):
+        """(schedule, tasks) đã lưu trữ của tuần 'tuanDD/MM/YYYY' (list rỗng nếu không có)"""
+        day_num = day_number(week_key[4:])
+        if day_num is None:
+            return [], []
+        block = self._read(semester_of(day_num)).get(week_key, {})
+        return block.get('schedule', []), block.get('tasks', [])
@@ -15,6 +15,31 @@ else:
 DATA_FILE = os.path.join(APP_DIR, "schedule_data.json")
 COOKIES_FILE = os.path.join(APP_DIR, "cookies.json")
 SETTINGS_FILE = os.path.join(APP_DIR, "settings.json")
+DB_FILE = os.path.join(APP_DIR, "schedule_data.db")
+WEEKS_DIR = os.path.join(APP_DIR, "weeks")
+FETCH_STATE_FILE = os.path.join(APP_DIR, "fetch_state.json")
+PARSER_RULES_FILE = os.path.join(APP_DIR, "parser_rules.json")
+PARSE_CACHE_FILE = os.path.join(APP_DIR, "parse_cache.json")
+ARCHIVE_DIR = os.path.join(APP_DIR, "archive")
+RENDER_CACHE_FILE = os.path.join(APP_DIR, "render_cache.json")
+
+# Thời gian gộp các lần save liên tiếp thành 1 lần ghi file (ms)
+SAVE_DEBOUNCE_MS = 500
+
+# Storage 'journal': gộp journal vào snapshot sau bấy nhiêu thay đổi
+JOURNAL_COMPACT_EVERY = 200
+
+# Storage lazy ('sqlite', 'weeks'): số tuần tối đa giữ trong bộ nhớ (LRU)
+LOADED_WEEKS_MAX = 8
+
+# Số bảng lịch đã parse giữ trong parse_cache.json
+PARSE_CACHE_MAX = 64
+
+# Số file lưu trữ học kỳ (đã giải nén) giữ trong bộ nhớ khi xem lại các tuần cũ
+ARCHIVE_CACHE_MAX = 2
+
+# Cửa sổ đăng nhập (WebEngine) ẩn quá lâu thì bị hủy để giải phóng renderer Chromium (ms)
+WEBENGINE_IDLE_MS = 10 * 60 * 1000
 
 # URL trang lịch học
 SCHEDULE_URL = "https://sv.iuh.edu.vn/lich-theo-tuan.html?pLoaiLich=1"
@@ -37,6 +62,15 @@ def get_schedule_url_for_week(week_offset=0):
         week_num = week_offset + 1
         return f"https://sv.iuh.edu.vn/lich-theo-tuan.html?pLoaiLich=1&pTuanHoc={week_num}"
 
+# Số request song song tối đa khi tải trước nhiều tuần
+PREFETCH_CONCURRENCY = 4
+
+# Đọc trang lịch theo từng chunk, dừng khi đã có bảng lịch; trang lớn hơn mức này bị bỏ
+FETCH_CHUNK_SIZE = 16 * 1024
+FETCH_MAX_BYTES = 2 * 1024 * 1024
+# Dừng sớm: phần còn lại ngắn hơn mức này được đọc bỏ để giữ connection keep-alive, dài hơn thì đóng
+FETCH_DRAIN_MAX = 64 * 1024
+
 # Màu sắc giống web IUH
 COLORS = {
     'header_bg': '#5a9fd4',
@@ -0,0 +1,331 @@
+"""
+Fetcher: Lấy lịch từ IUH ở thread nền, trả kết quả về UI thread qua signal
+"""
+import os
+import json
+import codecs
+import threading
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from .constants import (get_schedule_url_for_week, PREFETCH_CONCURRENCY, FETCH_STATE_FILE,
+                        FETCH_CHUNK_SIZE, FETCH_MAX_BYTES, FETCH_DRAIN_MAX)
+from .storage import atomic_write_json
+from .parser import MIN_PAGE_LENGTH, RULES, extract_timetable, timetable_hash, parse_schedule_cached
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """requests.Session dùng chung (keep-alive, pool đủ cho số request song song)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PREFETCH_CONCURRENCY)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+class FetchState:
+    """Lưu ETag/Last-Modified và hash bảng lịch của từng tuần đã fetch (fetch_state.json)
+
+    Mỗi state ghi kèm fingerprint của rule set đã parse tuần đó ('rules'). State của rule set khác
+    (đã sửa parser_rules.json) không được dùng để bỏ qua tuần - tuần đó được tải và parse lại.
+
+    Thread fetch chỉ đọc; state mới đi kèm kết quả fetch và được UI thread lưu sau khi merge
+    thành công (update_many), nên state không bao giờ mới hơn dữ liệu. Chỉ ghi file khi có thay đổi.
+    """
+
+    def __init__(self, path=FETCH_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._states = None
+
+    def _load(self):
+        if self._states is None:
+            self._states = {}
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._states = json.load(f)
+            except Exception as e:
+                pass
+        return self._states
+
+    def get(self, key):
+        with self._lock:
+            return dict(self._load().get(key, {}))
+
+    def update(self, key, **values):
+        self.update_many({key: values})
+
+    def update_many(self, states):
+        """Cập nhật state của nhiều tuần, ghi file 1 lần
+
+        Args:
+            states: Dict {key tuần: {'etag', 'last_modified', 'table_hash', 'rules'}} - giá trị None được bỏ qua
+        """
+        with self._lock:
+            saved = self._load()
+            changed = False
+            for key, values in states.items():
+                state = saved.setdefault(key, {})
+                values = {k: v for k, v in values.items() if v is not None}
+                if any(state.get(k) != v for k, v in values.items()):
+                    state.update(values)
+                    changed = True
+            if not changed:
+                return
+            try:
+                atomic_write_json(self.path, saved, separators=(',', ':'))
+            except Exception as e:
+                pass
+
+
+fetch_state = FetchState()
+
+
+def week_state_key(week_offset):
+    """Key của tuần trong FetchState: ngày thứ 2 (yyyy-mm-dd) - ổn định dù offset đổi theo thời gian"""
+    today = datetime.now()
+    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=week_offset)
+    return monday.strftime('%Y-%m-%d')
+
+
+def is_login_response(response, text=None):
+    """Cookies hết hạn: server chuyển hướng về trang đăng nhập hoặc trả về form login
+
+    Args:
+        text: Nội dung đã đọc (khi đọc stream), mặc định response.text
+    """
+    if response.status_code in (401, 403):
+        return True
+    url = response.url.lower()
+    if "dang-nhap" in url or "login" in url:
+        return True
+    if text is None:
+        text = response.text
+    return response.status_code == 200 and 'type="password"' in text
+
+
+class PageTooLarge(Exception):
+    """Trang trả về vượt FETCH_MAX_BYTES mà chưa thấy bảng lịch"""
+
+
+def drain_response(response, chunks, read, max_bytes=FETCH_DRAIN_MAX):
+    """Đọc bỏ phần còn lại của response để requests trả connection về pool (keep-alive)
+
+    Response chưa đọc hết bị Response.close() đóng hẳn connection - request sau (prefetch, refresh)
+    phải bắt tay TCP/TLS lại. Đọc bỏ vài chục KB rẻ hơn nhiều; phần còn lại dài hơn max_bytes
+    (theo Content-Length, hoặc đọc tới đó vẫn chưa hết) thì thôi, để close() đóng connection.
+
+    Args:
+        chunks: Iterator iter_content() đang đọc dở
+        read: Số byte đã đọc
+
+    Returns:
+        True nếu đã đọc hết response
+    """
+    length = response.headers.get('Content-Length') or ''
+    # Content-Length tính theo byte nén còn read theo byte đã giải nén - chỉ dùng để bỏ sớm
+    if length.isdigit() and int(length) - read > max_bytes:
+        return False
+    drained = 0
+    for chunk in chunks:
+        drained += len(chunk)
+        if drained > max_bytes:
+            return False
+    return True
+
+
+def read_schedule_page(response, max_bytes=FETCH_MAX_BYTES, chunk_size=FETCH_CHUNK_SIZE):
+    """Đọc response (stream=True) theo chunk, dừng ngay khi đã có trọn bảng lịch
+
+    Phần sau bảng lịch (footer, script cuối trang) không cần parse. Nếu phần đó ngắn (FETCH_DRAIN_MAX)
+    thì vẫn đọc bỏ cho hết để giữ connection keep-alive, dài hơn thì đóng connection - đánh đổi
+    vài chục KB tải thừa lấy việc không phải mở lại connection ở request sau. Decode UTF-8 dần theo chunk.
+
+    Returns:
+        (text, complete) - complete=False nếu dừng sớm
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parts = []
+    size = 0
+    length = 0
+    table_closed = False
+    chunks = response.iter_content(chunk_size=chunk_size)
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise PageTooLarge(f"Trang lịch lớn hơn {max_bytes // 1024} KB")
+            part = decoder.decode(chunk)
+            # Chỉ kiểm tra lại khi có thẻ đóng bảng mới (chừa 8 ký tự cho thẻ bị cắt giữa 2 chunk)
+            tail = (parts[-1][-8:] if parts else '') + part
+            table_closed = table_closed or '</table>' in tail.lower()
+            parts.append(part)
+            length += len(part)
+            if table_closed and length >= MIN_PAGE_LENGTH:
+                table_closed = False
+                text = ''.join(parts)
+                if extract_timetable(text):
+                    drain_response(response, chunks, size)
+                    return text, False
+                parts = [text]
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts), True
+    finally:
+        # Đã đọc hết: requests trả connection về pool, chưa hết: đóng connection
+        response.close()
+
+
+def fetch_week_schedule(week_offset, cookies, conditional=True):
+    """Tải và parse lịch của 1 tuần (chạy được ở thread nền)
+
+    Args:
+        week_offset: Số tuần tính từ tuần hiện tại
+        cookies: List cookies đã lưu [{'name', 'value', ...}]
+        conditional: Dùng ETag/Last-Modified và hash bảng lịch lần trước để bỏ qua tuần không đổi.
+                     False khi tuần chưa có dữ liệu (vd file dữ liệu bị xóa) - luôn tải và parse lại
+
+    Returns:
+        Dict {'week_offset', 'status_code', 'items', 'login_required',
+              'dates' (các ngày 'dd/mm/yyyy' của tuần trên trang, [] nếu không đọc được header),
+              'unchanged' (True nếu lịch không đổi so với lần fetch trước),
+              'fetch_state' (state mới của tuần cho FetchState - chỉ lưu sau khi merge thành công)}
+    """
+    url = get_schedule_url_for_week(week_offset)
+    cookies_dict = {c['name']: c['value'] for c in cookies}
+
+    # Conditional GET: server trả 304 nếu trang không đổi
+    state_key = week_state_key(week_offset)
+    state = fetch_state.get(state_key) if conditional else {}
+    # Lần trước parse bằng rule set khác: kết quả cũ có thể sai, không gửi ETag/bỏ qua theo hash
+    if state.get('rules') != RULES.fingerprint:
+        state = {}
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+
+    response = get_session().get(url, cookies=cookies_dict, headers=headers, timeout=30, stream=True)
+
+    result = {
+        'week_offset': week_offset,
+        'status_code': response.status_code,
+        'items': [],
+        'dates': [],
+        'login_required': False,
+        'unchanged': False,
+        'fetch_state': None,
+    }
+    if response.status_code == 304:
+        response.close()
+        result['unchanged'] = True
+        return result
+
+    html, _ = read_schedule_page(response)
+    result['login_required'] = login_required = is_login_response(response, html)
+    if response.status_code == 200 and not login_required:
+        table_hash = timetable_hash(html)
+        result['fetch_state'] = {
+            'key': state_key,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'table_hash': table_hash,
+            'rules': RULES.fingerprint,
+        }
+        # Bảng lịch giống lần trước -> bỏ qua parse/merge/save
+        if table_hash and table_hash == state.get('table_hash'):
+            result['unchanged'] = True
+            return result
+
+        # Parse thuần (không cần DataManager), bảng đã gặp thì lấy từ parse cache
+        result['items'], week_dates = parse_schedule_cached(html, table_hash=table_hash)
+        result['dates'] = [week_dates[day] for day in sorted(week_dates)] if week_dates else []
+
+    return result
+
+
+def save_fetch_states(results):
+    """Lưu state (ETag/Last-Modified/hash/rules) của các kết quả fetch - gọi trên UI thread sau khi merge xong"""
+    states = {}
+    for result in results:
+        state = result.get('fetch_state')
+        if state:
+            states[state['key']] = {k: v for k, v in state.items() if k != 'key'}
+    if states:
+        fetch_state.update_many(states)
+
+
+def fetch_weeks_schedule(week_offsets, cookies, conditional_offsets=None, max_workers=PREFETCH_CONCURRENCY):
+    """Tải song song nhiều tuần qua session dùng chung
+
+    Args:
+        conditional_offsets: Các tuần đã có dữ liệu (dùng conditional GET/hash), None = tất cả
+
+    Returns:
+        List kết quả theo thứ tự week_offsets, tuần lỗi có thêm key 'error'
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch_one(week_offset):
+        conditional = conditional_offsets is None or week_offset in conditional_offsets
+        try:
+            return fetch_week_schedule(week_offset, cookies, conditional)
+        except Exception as e:
+            return {'week_offset': week_offset, 'status_code': 0, 'items': [], 'dates': [],
+                    'login_required': False, 'unchanged': False, 'fetch_state': None, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch_one, week_offsets))
+
+
+class FetchSignals(QObject):
+    """Signals của các job fetch (QRunnable không phải QObject nên cần tách riêng)"""
+    finished = Signal(dict)
+    failed = Signal(int, str)  # week_offset, thông báo lỗi
+    batch_finished = Signal(list)  # List kết quả của PrefetchJob
+
+
+class FetchWeekJob(QRunnable):
+    """Job chạy trong QThreadPool: tải + parse lịch 1 tuần"""
+
+    def __init__(self, week_offset, cookies, conditional=True):
+        super().__init__()
+        self.week_offset = week_offset
+        self.cookies = cookies
+        self.conditional = conditional
+        self.signals = FetchSignals()
+
+    def run(self):
+        try:
+            result = fetch_week_schedule(self.week_offset, self.cookies, self.conditional)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.signals.failed.emit(self.week_offset, str(e))
+            return
+        self.signals.finished.emit(result)
+
+
+class PrefetchJob(QRunnable):
+    """Job chạy trong QThreadPool: tải song song lịch nhiều tuần"""
+
+    def __init__(self, week_offsets, cookies, conditional_offsets=None):
+        super().__init__()
+        self.week_offsets = list(week_offsets)
+        self.cookies = cookies
+        self.conditional_offsets = conditional_offsets
+        self.signals = FetchSignals()
+
+    def run(self):
+        self.signals.batch_finished.emit(
+            fetch_weeks_schedule(self.week_offsets, self.cookies, self.conditional_offsets))
@@ -1,16 +1,20 @@
 """
 LoginWindow: Cửa sổ đăng nhập IUH
+LoginSession: Giữ 1 LoginWindow (WebEngine) dùng lại cho mọi lần đăng nhập/refresh, đóng khi rảnh
 """
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QCheckBox
 )
 from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEngineProfile
-from PySide6.QtCore import Qt, QUrl, QTimer, Signal
+from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
+from PySide6.QtCore import Qt, QUrl, QTimer, Signal, QObject, QCoreApplication
 from PySide6.QtNetwork import QNetworkCookie
+import shiboken6
 
-from .constants import SCHEDULE_URL, LOGIN_URL
+from .constants import SCHEDULE_URL, LOGIN_URL, WEBENGINE_IDLE_MS
+
+START_STATUS = "🔴 Đăng nhập và TÌM menu 'LỊCH HỌC' hoặc 'THỚI KHÓA BIỂU' (sidebar), rồi bấm 'Lấy Lịch'"
 
 
 class LoginWindow(QMainWindow):
@@ -20,7 +24,7 @@ class LoginWindow(QMainWindow):
     schedule_fetched = Signal(int)
     login_required = Signal()
     
-    def __init__(self, data_manager, cookie_manager, on_success=None, auto_mode=False):
+    def __init__(self, data_manager, cookie_manager, on_success=None, auto_mode=False, profile=None):
         super().__init__()
         self.data_manager = data_manager
         self.cookie_manager = cookie_manager
@@ -42,7 +46,7 @@ class LoginWindow(QMainWindow):
         toolbar.setContentsMargins(10, 8, 10, 8)
         toolbar.setSpacing(10)
         
-        self.status = QLabel("🔴 Đăng nhập và TÌM menu 'LỊCH HỌC' hoặc 'THỚI KHÓA BIỂU' (sidebar), rồi bấm 'Lấy Lịch'")
+        self.status = QLabel(START_STATUS)
         self.status.setStyleSheet("font-size: 13px; padding: 5px;")
         toolbar.addWidget(self.status)
         toolbar.addStretch()
@@ -84,24 +88,40 @@ class LoginWindow(QMainWindow):
         
         layout.addLayout(toolbar)
         
-        # WebView with profile for cookies
-        self.profile = QWebEngineProfile("IUHProfile", self)
+        # WebView with profile for cookies (LoginSession truyền vào profile dùng chung)
+        self.profile = profile or QWebEngineProfile("IUHProfile", self)
         self.webview = QWebEngineView()
+        # Page phải dùng đúng profile thì cookies mới đi qua cookie store bên dưới
+        self.webview.setPage(QWebEnginePage(self.profile, self.webview))
         
         # Setup cookie tracking
         cookie_store = self.profile.cookieStore()
         cookie_store.cookieAdded.connect(self.on_cookie_added)
         
-        # Load saved cookies
-        if not auto_mode:
-            self.load_saved_cookies()
-        
         layout.addWidget(self.webview)
         
         self.webview.page().loadFinished.connect(self.on_load)
         
+        self.start(on_success, auto_mode)
+    
+    def start(self, on_success=None, auto_mode=False):
+        """Bắt đầu 1 lượt đăng nhập/lấy lịch mới, dùng lại cửa sổ và WebEngine đang có
+        
+        Args:
+            on_success: Hàm gọi khi xong
+            auto_mode: True = refresh tự động bằng cookies, báo login_required nếu cookies hết hạn
+        """
+        self.on_success = on_success
+        self.auto_mode = auto_mode
+        self.login_detected = False
+        self.status.setText(START_STATUS)
+        
+        # Load saved cookies
+        if not auto_mode:
+            self.load_saved_cookies()
+        
         # Start URL
-        start_url = SCHEDULE_URL if cookie_manager.has_cookies() else LOGIN_URL
+        start_url = SCHEDULE_URL if self.cookie_manager.has_cookies() else LOGIN_URL
         self.webview.load(QUrl(start_url))
     
     def load_saved_cookies(self):
@@ -213,3 +233,89 @@ class LoginWindow(QMainWindow):
         self.login_success.emit()
         if self.on_success:
             self.on_success()
+
+
+class LoginSession(QObject):
+    """1 LoginWindow dùng chung cho open_login và refresh bằng WebEngine
+    
+    Cửa sổ (kèm renderer Chromium) được tạo ở lần dùng đầu, các lần sau chỉ điều hướng lại.
+    Sau WEBENGINE_IDLE_MS không dùng và cửa sổ đang ẩn thì cửa sổ bị hủy, giải phóng renderer -
+    lần sau tạo lại với cùng profile. Bộ nhớ không tăng dần theo số lần refresh.
+    
+    Profile thuộc session còn cửa sổ không có cha, nên lúc thoát app (aboutToQuit) cửa sổ được hủy
+    trước - QtWebEngine không cho hủy profile khi page dùng nó vẫn còn.
+    """
+    
+    login_required = Signal()
+    
+    def __init__(self, data_manager, cookie_manager, parent=None):
+        super().__init__(parent)
+        self.data_manager = data_manager
+        self.cookie_manager = cookie_manager
+        self.profile = QWebEngineProfile("IUHProfile", self)
+        self.window = None
+        
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(WEBENGINE_IDLE_MS)
+        self._idle_timer.timeout.connect(self._on_idle)
+        
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.close)
+    
+    def open(self, on_success=None, auto_mode=False, show=True):
+        """Bắt đầu 1 lượt đăng nhập/lấy lịch trên cửa sổ dùng chung
+        
+        Args:
+            on_success: Hàm gọi khi xong
+            auto_mode: Refresh tự động bằng cookies (xem LoginWindow.start)
+            show: Hiện cửa sổ; False = chạy ẩn, chỉ báo login_required nếu cần đăng nhập
+
+        Lượt chạy ẩn không điều hướng lại cửa sổ đang hiện (người dùng có thể đang nhập mật khẩu) -
+        chỉ báo login_required, lượt đang mở vẫn giữ on_success/auto_mode của nó.
+
+        Returns:
+            LoginWindow đang dùng
+        """
+        if not show and self.window is not None and self.window.isVisible():
+            print("⏭️ Cửa sổ đăng nhập đang mở, bỏ qua refresh ẩn")
+            self.login_required.emit()
+            return self.window
+        if self.window is None:
+            self.window = LoginWindow(self.data_manager, self.cookie_manager, on_success, auto_mode,
+                                      profile=self.profile)
+            self.window.login_required.connect(self.login_required)
+        else:
+            self.window.start(on_success, auto_mode)
+        if show:
+            self.window.show()
+            self.window.raise_()
+            self.window.activateWindow()
+        self._idle_timer.start()
+        return self.window
+    
+    def _on_idle(self):
+        """Hết thời gian rảnh: hủy cửa sổ đang ẩn (đang mở thì đợi thêm)"""
+        if self.window is None:
+            return
+        if self.window.isVisible():
+            self._idle_timer.start()
+            return
+        print("🧹 Đóng WebEngine không dùng tới")
+        self.close()
+    
+    def close(self):
+        """Hủy cửa sổ và renderer của nó ngay (profile giữ lại cho lần sau)
+        
+        Hủy thẳng thay vì deleteLater: close() cũng chạy lúc thoát app, khi event loop đã dừng và
+        deleteLater không còn được xử lý.
+        """
+        self._idle_timer.stop()
+        window, self.window = self.window, None
+        if window is None:
+            return
+        window.hide()
+        # Page dùng profile của session - hủy trước cửa sổ (và trước profile)
+        shiboken6.delete(window.webview.page())
+        shiboken6.delete(window)
@@ -4,12 +4,25 @@ Managers: Quản lý cookies, settings, data
 import os
 import sys
 import json
-import winreg
-import re
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from PySide6.QtCore import Signal, QObject
+from PySide6.QtCore import Signal, QObject, QTimer
 
-from .constants import DATA_FILE, COOKIES_FILE, SETTINGS_FILE, DAYS, PERIODS
+from .constants import COOKIES_FILE, SETTINGS_FILE, DAYS, PERIODS, SAVE_DEBOUNCE_MS, LOADED_WEEKS_MAX
+from .storage import JsonStorage, iso_date, day_number, week_number, week_monday, day_iso
+from .records import ScheduleItem, Task, new_task_id
+from .parser import parse_schedule, parse_schedule_cached, parse_week_dates
+
+
+def _consume(items):
+    """Duyệt list và bỏ từng phần tử khỏi list ngay sau khi dùng
+    
+    Khi load, dict JSON của mỗi item được giải phóng ngay sau khi chuyển thành record - bộ nhớ
+    tối đa không phải giữ cùng lúc cả list dict lẫn các record.
+    """
+    for index, item in enumerate(items):
+        items[index] = None
+        yield item
 
 
 class CookieManager:
@@ -56,7 +69,11 @@ class SettingsManager:
         self.settings = {
             'auto_refresh_hours': 6,
             'run_at_startup': False,
-            'last_successful_fetch': None
+            'last_successful_fetch': None,
+            'storage_engine': 'json',  # 'json', 'journal', 'sqlite' hoặc 'weeks'
+            'prefetch_from': -2,  # Tải trước lịch từ tuần (offset so với tuần này)
+            'prefetch_to': 8,  # ... tới tuần
+            'retention_weeks': 20,  # Giữ bấy nhiêu tuần trước tuần này trong file dữ liệu, cũ hơn thì lưu trữ (None = không)
         }
         self.load()
     
@@ -94,6 +111,7 @@ class SettingsManager:
         app_name = "IUHScheduleWidget"
         
         try:
+            import winreg
             key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_SET_VALUE)
             if enabled:
                 winreg.SetValueEx(key, app_name, 0, winreg.REG_SZ, cmd)
@@ -110,239 +128,584 @@ class SettingsManager:
 class DataManager(QObject):
     """Quản lý dữ liệu lịch học và task"""
     data_changed = Signal()
+    # List các thay đổi: {'action': 'added'|'updated'|'removed', 'type': 'schedule'|'task',
+    #                     'date': 'dd/mm/yyyy' hoặc '', 'day': int, 'period': int}
+    items_changed = Signal(list)
     
-    def __init__(self):
+    def __init__(self, storage=None, archive=None, render_cache=None, defer_load=False):
         super().__init__()
-        self.schedule = []
-        self.tasks = []
-        self.load()
+        self.storage = storage or JsonStorage()
+        # ScheduleArchive chứa các tuần cũ đã chuyển khỏi file dữ liệu (None = không dùng)
+        self.archive = archive
+        # RenderCache chụp các ô của tuần hiện tại mỗi lần lưu (None = không dùng)
+        self.render_cache = render_cache
+        # False cho tới khi load() xong (defer_load=True: app.py gọi load() sau lần vẽ đầu)
+        self.loaded = False
+        # (week_dates, items 7x3) đọc từ render cache - get_week() trả về cho tới khi load xong
+        self._cached_week = None
+        # Các môn học (dict dùng như set có thứ tự), để bỏ môn khi merge không phải quét list
+        self._schedule = {}
+        # id -> Task (theo thứ tự thêm), để sửa/xóa task không phải quét list
+        self._tasks = {}
+        # Id các task storage trả về ở load() (không theo tuần) - không bỏ khi evict tuần
+        self._pinned_tasks = set()
+        # Index (số ngày, ca) -> [items đã sắp xếp], để tra cứu ô không phải quét toàn bộ dữ liệu
+        self._cell_index = {}
+        # Tasks format cũ không có date: (thứ, ca) -> [items], hiện ở mọi tuần
+        self._undated_tasks = {}
+        # Số tuần -> key tuần 'tuanDD/MM/YYYY' của snapshot
+        self._week_key_cache = {}
+        # Storage lazy: các tuần (số tuần) đã load vào bộ nhớ, theo thứ tự LRU
+        self._loaded_weeks = OrderedDict()
+        # Tuần widget đang hiện (số tuần) - không bị bỏ khỏi bộ nhớ, xem set_visible_week()
+        self._visible_week = None
+        # Các tuần đã đọc từ archive (số tuần, LRU) và index ô riêng của chúng - chỉ để xem
+        self._archived_weeks = OrderedDict()
+        self._archived_cells = {}
+        
+        # Ghi file trễ (debounce), storage ghi ở thread nền
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(SAVE_DEBOUNCE_MS)
+        self._save_timer.timeout.connect(self._write_snapshot)
+        if not defer_load:
+            self.load()
+    
+    def load_render_cache(self):
+        """Đọc ảnh chụp tuần hiện tại từ render cache (dùng với defer_load=True, trước load())
+        
+        Returns:
+            True nếu có ảnh chụp đúng tuần này - widget vẽ được ngay, chưa cần load dữ liệu
+        """
+        if self.render_cache is None or self.loaded:
+            return False
+        week_dates = self.get_week_dates_from_offset(0)
+        week = self.render_cache.load(week_dates)
+        if week is None:
+            return False
+        self._cached_week = (week_dates, week)
+        return True
+    
+    def write_render_cache(self):
+        """Chụp các ô của tuần hiện tại cho lần khởi động sau (xem RenderCache)"""
+        if self.render_cache is None or not self.loaded or not self.has_data():
+            return
+        week_dates = self.get_week_dates_from_offset(0)
+        self.render_cache.save(week_dates, self.get_week(week_dates))
     
     def load(self):
-        """Load dữ liệu từ file"""
+        """Load dữ liệu qua storage engine
+        
+        Nếu widget đang vẽ từ render cache, phát data_changed để các ô cập nhật theo dữ liệu thật.
+        """
+        self._loaded_weeks = OrderedDict()
+        self._schedule = {}
+        self._tasks = {}
+        self._pinned_tasks = set()
         try:
-            if os.path.exists(DATA_FILE):
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # Hỗ trợ cả format cũ (flat) và mới (week-based)
-                    if 'schedule' in data:
-                        # Format cũ - chuyển sang format mới
-                        self.schedule = data.get('schedule', [])
-                        self.tasks = data.get('tasks', [])
-                    else:
-                        # Format mới - gộp tất cả tuần lại
-                        self.schedule = []
-                        self.tasks = []
-                        for week_key, week_data in data.items():
-                            if week_key.startswith('tuan'):
-                                self.schedule.extend(week_data.get('schedule', []))
-                                self.tasks.extend(week_data.get('tasks', []))
-            else:
-                pass
+            schedule, tasks = self.storage.load()
+            self._schedule = dict.fromkeys(map(ScheduleItem, _consume(schedule)))
+            self._pinned_tasks = {task.id for task in self._add_loaded_tasks(_consume(tasks))}
         except Exception as e:
             pass
+        self.rebuild_index()
+        self.loaded = True
+        if self._cached_week is not None:
+            self._cached_week = None
+            self.data_changed.emit()
     
-    def save(self):
-        """Lưu dữ liệu ra file, tổ chức theo tuần"""
+    @property
+    def schedule(self):
+        """List môn học (theo thứ tự thêm)"""
+        return list(self._schedule)
+    
+    @property
+    def tasks(self):
+        """List tasks (theo thứ tự thêm)"""
+        return list(self._tasks.values())
+    
+    def _add_loaded_tasks(self, tasks):
+        """Thêm tasks đọc từ storage vào map id -> Task, trả về list Task
+        
+        Id cũ dạng timestamp (float, có thể trùng khi thêm nhanh) hoặc bị trùng được đổi sang
+        new_task_id() và ghi lại qua storage như 1 lần update_task.
+        """
+        added = []
+        migrated = False
+        by_id = self._tasks
+        for data in tasks:
+            task = Task(data)
+            task_id = task.id
+            if type(task_id) is not str or task_id in by_id:
+                # Gán thẳng field (id không ảnh hưởng field dẫn xuất, không cần _derive lại)
+                task.id = new_task_id()
+                self.storage.record({'op': 'update_task', 'id': data.get('id'), 'fields': {'id': task.id}})
+                migrated = True
+            by_id[task.id] = task
+            added.append(task)
+        if migrated:
+            self.save()
+        return added
+    
+    @staticmethod
+    def _start_time(entry):
+        """Giờ bắt đầu (phút trong ngày) của 1 item, dùng để sắp xếp trong ô"""
+        return entry['data'].start
+    
+    def _index_bucket(self, item_type, data, create=False):
+        """Tìm bucket trong index chứa item (None nếu item không được index)"""
+        if data.day_num is not None:
+            index, key = self._cell_index, (data.day_num, data.period)
+        elif item_type == 'task' and not iso_date(data.get('date') or ''):
+            index, key = self._undated_tasks, (data.get('day'), data.get('period'))
+        else:
+            # Lịch học không có date không bao giờ khớp tuần nào
+            return None
+        if create:
+            return index.setdefault(key, [])
+        return index.get(key)
+    
+    def _index_item(self, item_type, data):
+        """Thêm 1 item vào index, giữ bucket sắp xếp theo giờ bắt đầu"""
+        bucket = self._index_bucket(item_type, data, create=True)
+        if bucket is None:
+            return
+        bucket.append({'type': item_type, 'data': data})
+        bucket.sort(key=self._start_time)
+    
+    def _unindex_item(self, item_type, data):
+        """Xóa 1 item khỏi index"""
+        bucket = self._index_bucket(item_type, data)
+        if not bucket:
+            return
+        bucket[:] = [e for e in bucket if e['data'] is not data]
+    
+    def rebuild_index(self):
+        """Dựng lại toàn bộ index từ self._schedule và self._tasks"""
+        self._cell_index = cell_index = {}
+        self._undated_tasks = {}
+        for item_type, items in (('schedule', self._schedule), ('task', self._tasks.values())):
+            for data in items:
+                if data.day_num is not None:
+                    bucket = cell_index.get((data.day_num, data.period))
+                    if bucket is None:
+                        bucket = cell_index[(data.day_num, data.period)] = []
+                else:
+                    bucket = self._index_bucket(item_type, data, create=True)
+                    if bucket is None:
+                        continue
+                bucket.append({'type': item_type, 'data': data})
+        for bucket in self._cell_index.values():
+            bucket.sort(key=self._start_time)
+        for bucket in self._undated_tasks.values():
+            bucket.sort(key=self._start_time)
+    
+    def ensure_week(self, week_dates):
+        """Với storage lazy: load items của tuần vào bộ nhớ nếu chưa có
+        
+        Args:
+            week_dates: Dict {day_idx: 'dd/mm/yyyy'} của tuần cần dùng
+        """
+        if not week_dates:
+            return
+        day_num = day_number(week_dates.get(0, ''))
+        if day_num is None:
+            return
+        self._ensure_week_num(week_number(day_num))
+        self._ensure_archived_week(week_number(day_num))
+    
+    def set_visible_week(self, week_dates):
+        """Đánh dấu tuần widget đang hiện - tuần này (và tuần hiện tại) luôn được giữ trong bộ nhớ
+        
+        Args:
+            week_dates: Dict {day_idx: 'dd/mm/yyyy'} của tuần đang hiện
+        """
+        day_num = day_number((week_dates or {}).get(0, ''))
+        self._visible_week = week_number(day_num) if day_num is not None else None
+    
+    def _ensure_date(self, date):
+        """Load tuần chứa ngày 'dd/mm/yyyy' trước khi sửa dữ liệu của tuần đó (storage lazy)"""
+        day_num = day_number(date) if date else None
+        if day_num is not None:
+            self._ensure_week_num(week_number(day_num))
+    
+    def _ensure_week_num(self, week):
+        """ensure_week theo số tuần"""
+        if not self.storage.lazy:
+            return
+        if week in self._loaded_weeks:
+            self._loaded_weeks.move_to_end(week)
+            return
+        self._loaded_weeks[week] = True
+        monday = week_monday(week)
         try:
-            # Phân loại schedule theo tuần
-            weeks = {}
-            for item in self.schedule:
-                date = item.get('date', '')
-                if len(date) >= 10:  # dd/mm/yyyy
-                    # Tính ngày thứ 2 của tuần này
-                    try:
-                        from datetime import datetime, timedelta
-                        day, month, year = date.split('/')
-                        item_date = datetime(int(year), int(month), int(day))
-                        days_since_monday = item_date.weekday()
-                        monday = item_date - timedelta(days=days_since_monday)
-                        week_key = f"tuan{monday.strftime('%d/%m/%Y')}"
-                        
-                        if week_key not in weeks:
-                            weeks[week_key] = {'schedule': [], 'tasks': []}
-                        weeks[week_key]['schedule'].append(item)
-                    except:
-                        # Nếu parse lỗi, bỏ vào tuần "unknown"
-                        if 'unknown' not in weeks:
-                            weeks['unknown'] = {'schedule': [], 'tasks': []}
-                        weeks['unknown']['schedule'].append(item)
-            
-            # Thêm tasks vào tuần tương ứng hoặc tuần hiện tại
-            for task in self.tasks:
-                # Tasks không có date cụ thể, bỏ vào tất cả các tuần
-                # Hoặc có thể tạo key riêng cho tasks
-                if weeks:
-                    # Bỏ vào tuần đầu tiên
-                    first_week = list(weeks.keys())[0]
-                    weeks[first_week]['tasks'].append(task)
-            
-            # Thêm timestamp
-            weeks['updated'] = datetime.now().isoformat()
-            
-            with open(DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(weeks, f, ensure_ascii=False, indent=2)
+            # Đợi writer ghi xong các thay đổi đã gửi - đọc từ storage phải thấy bản mới nhất
+            self.storage.flush()
+            schedule, tasks = self.storage.load_range(day_iso(monday), day_iso(monday + len(DAYS) - 1))
         except Exception as e:
-            pass
             import traceback
             traceback.print_exc()
+            return
+        schedule = [ScheduleItem(item) for item in schedule]
+        tasks = self._add_loaded_tasks(tasks)
+        self._schedule.update(dict.fromkeys(schedule))
+        for item in schedule:
+            self._index_item('schedule', item)
+        for task in tasks:
+            self._index_item('task', task)
+        
+        # Bỏ các tuần lâu không dùng để bộ nhớ không tăng theo lịch sử. Không bỏ tuần đang hiện,
+        # tuần hiện tại (render cache) và tuần vừa load
+        keep = {self._visible_week, week_number(datetime.now().toordinal()), week}
+        while len(self._loaded_weeks) > LOADED_WEEKS_MAX:
+            victim = next((w for w in self._loaded_weeks if w not in keep), None)
+            if victim is None or not self._evict_week(victim):
+                break
     
-    def parse_schedule_html(self, html, week_dates=None, auto_save=True, merge_mode=False):
-        """Parse HTML lịch học từ IUH
+    def _sync_storage(self):
+        """Ghi mọi thay đổi trong bộ nhớ vào storage và đợi ghi xong (không ghi render cache)
         
-        Args:
-            html: HTML content
-            week_dates: Dict map day_idx -> date string (e.g. {0: '03/02/2026', 1: '04/02/2026'})
-            auto_save: Tự động lưu file sau khi parse (mặc định True)
-            merge_mode: Nếu True, merge vào schedule hiện tại thay vì xóa (mặc định False)
+        Returns:
+            True nếu ghi thành công
         """
-        # Backup schedule cũ nếu merge_mode
-        old_schedule = self.schedule.copy() if merge_mode else []
+        try:
+            self.storage.sync(self.build_snapshot)
+            self.storage.flush()
+            return True
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return False
+    
+    def _evict_week(self, week):
+        """Bỏ items của 1 tuần khỏi bộ nhớ (storage lazy)
         
-        self.schedule = []
+        Luôn ghi xuống storage trước (kể cả khi chưa đặt lịch save, vd merge_week) - sau khi bỏ,
+        storage không còn theo dõi tuần này nên thay đổi chưa ghi sẽ mất.
         
-        # Parse ngày tháng từ header nếu chưa có
-        if not week_dates:
-            week_dates = self._parse_week_dates_from_html(html)
+        Returns:
+            False nếu ghi lỗi - tuần được giữ lại trong bộ nhớ
+        """
+        if not self._sync_storage():
+            return False
+        del self._loaded_weeks[week]
         
-        if len(html) < 5000:
-            return 0
+        monday = day_iso(week_monday(week))
+        sunday = day_iso(week_monday(week) + len(DAYS) - 1)
         
-        error_patterns = ['<title>404', '<title>500', 'page not found', 'server error', '503 service']
-        is_error_page = any(pattern in html.lower() for pattern in error_patterns)
-        if is_error_page:
-            return 0
+        def in_week(item):
+            if item.day_num is None:
+                # Ngày không có thật (vd 31/02): storage lấy theo chuỗi ISO nên cũng bỏ theo chuỗi
+                return monday <= iso_date(item.get('date') or '') <= sunday
+            return week_number(item.day_num) == week
+        
+        self._schedule = {s: None for s in self._schedule if not in_week(s)}
+        self._tasks = {task_id: t for task_id, t in self._tasks.items()
+                       if task_id in self._pinned_tasks or not in_week(t)}
+        for key in [k for k in self._cell_index if week_number(k[0]) == week]:
+            del self._cell_index[key]
+        self.storage.release(monday)
+        return True
+    
+    def _ensure_archived_week(self, week):
+        """Đọc items của 1 tuần cũ từ archive vào index riêng (bỏ các item đang có trong dữ liệu chính)"""
+        if self.archive is None or week >= week_number(datetime.now().toordinal()):
+            return
+        if week in self._archived_weeks:
+            self._archived_weeks.move_to_end(week)
+            return
+        self._archived_weeks[week] = True
+        try:
+            schedule, tasks = self.archive.load_week(self._week_key_of(week_monday(week)))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            schedule, tasks = [], []
+        monday = week_monday(week)
+        hot_keys = {self._merge_key(entry['data'])
+                    for day_num in range(monday, monday + len(DAYS)) for period in range(len(PERIODS))
+                    for entry in self._cell_index.get((day_num, period), ()) if entry['type'] == 'schedule'}
+        entries = [('schedule', item) for item in map(ScheduleItem, schedule) if self._merge_key(item) not in hot_keys]
+        entries += [('task', task) for task in map(Task, tasks) if task.get('id') not in self._tasks]
+        for item_type, data in entries:
+            if data.day_num is not None:
+                self._archived_cells.setdefault((data.day_num, data.period), []).append({'type': item_type, 'data': data})
         
-        table_match = re.search(r'<table[^>]*>(.*?)</table>', html, re.DOTALL | re.IGNORECASE)
+        while len(self._archived_weeks) > LOADED_WEEKS_MAX:
+            self._drop_archived_week(next(iter(self._archived_weeks)))
+    
+    def _drop_archived_week(self, week):
+        """Bỏ tuần đã đọc từ archive khỏi bộ nhớ (đọc lại ở lần xem sau)"""
+        self._archived_weeks.pop(week, None)
+        for key in [k for k in self._archived_cells if week_number(k[0]) == week]:
+            del self._archived_cells[key]
+    
+    def apply_retention(self, keep_weeks):
+        """Chuyển lịch học và task đã xong của các tuần cũ hơn keep_weeks tuần trước tuần này vào archive
         
-        if not table_match or len(table_match.group(1)) < 1000:
-            tables = re.findall(r'<table[^>]*>(.*?)</table>', html, re.DOTALL | re.IGNORECASE)
-            for tbl in tables:
-                if ('đứ' in tbl.lower() or 'sáng' in tbl.lower() or 'chiều' in tbl.lower()) and len(tbl) > 1000:
-                    table_match = type('obj', (object,), {'group': lambda self, n: tbl})()
-                    break
+        Giữ file dữ liệu chính ở kích thước gần như cố định. Task chưa xong và task không có ngày ở lại.
+        Storage lazy ('sqlite', 'weeks') vốn chỉ load tuần đang xem nên không cần.
         
-        if not table_match:
+        Returns:
+            Số items đã chuyển
+        """
+        if self.archive is None or keep_weeks is None or keep_weeks < 0 or self.storage.lazy:
+            return 0
+        cutoff = week_monday(week_number(datetime.now().toordinal()) - keep_weeks)
+        old_items = [item for item in self._schedule if item.day_num is not None and item.day_num < cutoff]
+        old_tasks = [task for task in self._tasks.values()
+                     if task.day_num is not None and task.day_num < cutoff and task.get('done')]
+        if not old_items and not old_tasks:
             return 0
         
-        table_html = table_match.group(1)
-        rows = re.findall(r'<tr[^>]*>(.*?)</tr>', table_html, re.DOTALL)
+        blocks = {}
+        for item_type, items in (('schedule', old_items), ('tasks', old_tasks)):
+            for data in items:
+                block = blocks.setdefault(self._week_key_of(data.day_num), {'schedule': [], 'tasks': []})
+                block[item_type].append(data.to_dict())
+        # Ghi archive trước, rồi mới bỏ khỏi dữ liệu chính (crash giữa chừng chỉ làm trùng, không mất)
+        self.archive.add(blocks)
         
-        for row_idx, row_html in enumerate(rows):
-            cells = re.findall(r'<td[^>]*>(.*?)</td>', row_html, re.DOTALL)
-            
-            if len(cells) < 2:
-                continue
-            
-            first_cell_text = re.sub(r'<[^>]+>', '', cells[0]).strip()
-            
-            period = -1
-            if 'Sáng' in first_cell_text:
-                period = 0
-            elif 'Chiều' in first_cell_text:
-                period = 1  
-            elif 'Tối' in first_cell_text:
-                period = 2
-            
-            if period == -1:
+        for item in old_items:
+            self._unindex_item('schedule', item)
+            del self._schedule[item]
+        for task in old_tasks:
+            self._unindex_item('task', task)
+            del self._tasks[task['id']]
+            self._pinned_tasks.discard(task['id'])
+        self._archived_weeks.clear()
+        self._archived_cells = {}
+        self.storage.record({'op': 'archive_before', 'date': day_iso(cutoff)})
+        self.save()
+        return len(old_items) + len(old_tasks)
+    
+    def has_data(self):
+        """Có dữ liệu lịch/task nào không (kể cả các tuần chưa load)"""
+        if self._schedule or self._tasks:
+            return True
+        return self.storage.lazy and self.storage.has_data()
+    
+    def has_week_schedule(self, week_dates):
+        """Tuần đã có lịch học trong dữ liệu chưa (kể cả tuần chưa load, không load tuần đó)
+        
+        Fetcher chỉ dùng conditional GET / hash bảng lịch để bỏ qua merge khi tuần đã có dữ liệu.
+        """
+        day_num = day_number((week_dates or {}).get(0, ''))
+        if day_num is None:
+            return False
+        week = week_number(day_num)
+        monday = week_monday(week)
+        for day_num in range(monday, monday + len(DAYS)):
+            for period in range(len(PERIODS)):
+                if any(entry['type'] == 'schedule' for entry in self._cell_index.get((day_num, period), ())):
+                    return True
+        if self.storage.lazy and week not in self._loaded_weeks:
+            return self.storage.has_schedule(day_iso(monday), day_iso(monday + len(DAYS) - 1))
+        return False
+    
+    @staticmethod
+    def _merge_key(item):
+        """Key so khớp môn học (ScheduleItem) khi merge: (ngày, tiết, thứ)"""
+        return (item.date, item.tiet, item.day)
+    
+    def merge_week(self, items, dates=None):
+        """Merge lịch vừa lấy của 1 tuần vào data: upsert theo (ngày, tiết, thứ) và bỏ các môn
+        không còn trên trang (dời/hủy lịch)
+        
+        Các ngày trong `dates` được thay bằng đúng nội dung trang (kể cả tuần trống). Môn cũ được tìm
+        qua index ô (số ngày, ca) nên chi phí chỉ phụ thuộc số môn của tuần, không phụ thuộc lịch sử.
+        
+        Args:
+            items: List môn học (dict) parse từ trang lịch
+            dates: Các ngày 'dd/mm/yyyy' trang lịch bao phủ (vd week_dates.values()).
+                   Nếu không có, dùng các ngày có môn trong items
+        
+        Returns:
+            Dict {'added', 'updated', 'removed'}: số môn thêm/sửa/bỏ
+        """
+        counts = {'added': 0, 'updated': 0, 'removed': 0}
+        fresh = [ScheduleItem(item) for item in items]
+        # Môn không có ngày hợp lệ không hiện ở tuần nào - bỏ qua thay vì thêm trùng mỗi lần fetch
+        fresh = [item for item in fresh if item.day_num is not None]
+        day_nums = {day_number(date) for date in (dates or ())} - {None} or {item.day_num for item in fresh}
+        if not day_nums:
+            return counts
+        for week in {week_number(day_num) for day_num in day_nums}:
+            self._ensure_week_num(week)
+            # Tuần cũ vừa lấy lại: đọc lại archive (bỏ trùng) ở lần xem sau
+            self._drop_archived_week(week)
+        
+        # Các môn hiện có của những ngày này, theo key
+        existing = {}
+        for day_num in sorted(day_nums):
+            for period in range(len(PERIODS)):
+                for entry in self._cell_index.get((day_num, period), ()):
+                    if entry['type'] == 'schedule':
+                        existing.setdefault(self._merge_key(entry['data']), []).append(entry['data'])
+        
+        changes = []
+        for item in fresh:
+            candidates = existing.get(self._merge_key(item))
+            if not candidates:
+                self._schedule[item] = None
+                self._index_item('schedule', item)
+                changes.append(self._change('added', 'schedule', item))
+                counts['added'] += 1
                 continue
-            
-            for day_idx in range(7):
-                cell_idx = day_idx + 1
-                
-                if cell_idx >= len(cells):
-                    break
-                
-                cell_html = cells[cell_idx]
-                cell_text = re.sub(r'<[^>]+>', ' ', cell_html).strip()
-                cell_text = re.sub(r'\s+', ' ', cell_text)
-                
-                if not cell_text or len(cell_text) < 15:
-                    continue
-                
-                cell_clean = re.sub(r'<[^>]+>', '\n', cell_html)
-                lines = [l.strip() for l in cell_clean.split('\n') if l.strip()]
-                
-                subject_names = []
-                for line in lines:
-                    if re.match(r'^DH[A-Z0-9]+', line):
-                        continue
-                    if re.match(r'^[\d\s\-–]+$', line):
-                        continue
-                    if len(line) < 10:
-                        continue
-                    if re.match(r'^(Tiết|Phòng|GV|Giảng viên)\s*:', line, re.IGNORECASE):
-                        continue
-                    if re.match(r'^[A-Z]\d+\.', line) or re.match(r'^[A-Z]\d+\.\d+', line):
-                        continue
-                    words = line.split()
-                    if len(words) <= 4 and all(w[0].isupper() for w in words if w):
-                        if not any(kw in line.lower() for kw in ['học', 'trình', 'liệu', 'nghệ', 'trúc', 'nhập', 'môn', 'quản', 'phát', 'triển', 'cntt', 'dự án']):
-                            continue
-                    subject_names.append(line)
-                
-                tiet_matches = list(re.finditer(r'Tiết\s*:\s*(\d+)\s*[-–]\s*(\d+)', cell_clean))
-                
-                if not tiet_matches:
-                    continue
-                
-                phong_matches = list(re.finditer(r'Phòng\s*:\s*([A-Z0-9][A-Za-z0-9\.]*)', cell_clean))
-                
-                for idx, tiet_match in enumerate(tiet_matches):
-                    tiet_str = f"{tiet_match.group(1)}-{tiet_match.group(2)}"
-                    
-                    if idx < len(subject_names):
-                        subject_name = subject_names[idx]
-                    else:
-                        subject_name = subject_names[-1] if subject_names else "Môn học"
-                    
-                    room = None
-                    if idx < len(phong_matches):
-                        room = phong_matches[idx].group(1)
-                    
-                    item = {
-                        'raw': f"{subject_name} Tiết:{tiet_str}"[:200],
-                        'day': day_idx,
-                        'period': period,
-                        'subject': subject_name[:60],
-                        'tiet': tiet_str
-                    }
-                    
-                    # Thêm ngày tháng nếu có
-                    if week_dates and day_idx in week_dates:
-                        item['date'] = week_dates[day_idx]
-                    
-                    if room:
-                        item['room'] = room
-                    
-                    self.schedule.append(item)
-        
-        # Merge với schedule cũ nếu merge_mode
-        if merge_mode and old_schedule:
-            # Tạo set các key từ schedule cũ
-            existing_keys = set()
-            for item in old_schedule:
-                key = (item.get('date', ''), item.get('subject', ''), item.get('tiet', ''), item.get('day', -1))
-                existing_keys.add(key)
-            
-            # Lọc duplicate từ schedule mới
-            new_items = []
-            duplicate_count = 0
-            for item in self.schedule:
-                key = (item.get('date', ''), item.get('subject', ''), item.get('tiet', ''), item.get('day', -1))
-                if key not in existing_keys:
-                    new_items.append(item)
-                    existing_keys.add(key)
-                else:
-                    duplicate_count += 1
-            
-            # Merge: schedule cũ + items mới (không trùng)
-            self.schedule = old_schedule + new_items
+            # Nhiều lớp cùng tiết: ưu tiên môn cùng tên
+            match = next((c for c in candidates if c.subject == item.subject), candidates[0])
+            candidates.remove(match)
+            if match.to_dict() != item.to_dict():
+                old_period = match.get('period')
+                self._unindex_item('schedule', match)
+                match.update(item.to_dict())
+                self._index_item('schedule', match)
+                if old_period != match.get('period'):
+                    changes.append(self._change('removed', 'schedule', dict(match.to_dict(), period=old_period)))
+                changes.append(self._change('updated', 'schedule', match))
+                counts['updated'] += 1
+        
+        # Môn cũ không còn trên trang
+        for candidates in existing.values():
+            for item in candidates:
+                self._unindex_item('schedule', item)
+                self._schedule.pop(item, None)
+                changes.append(self._change('removed', 'schedule', item))
+                counts['removed'] += 1
+        
+        if changes:
+            week_items = [entry['data'].to_dict() for day_num in sorted(day_nums) for period in range(len(PERIODS))
+                          for entry in self._cell_index.get((day_num, period), ()) if entry['type'] == 'schedule']
+            self.storage.record({'op': 'replace_days', 'dates': sorted(day_iso(d) for d in day_nums),
+                                 'items': week_items})
+            self.items_changed.emit(changes)
+        return counts
+    
+    @staticmethod
+    def _change(action, item_type, data):
+        """Tạo 1 sự kiện thay đổi cho items_changed"""
+        return {
+            'action': action,
+            'type': item_type,
+            'date': data.get('date') or '',
+            'day': data.get('day'),
+            'period': data.get('period'),
+        }
+    
+    def save(self):
+        """Đặt lịch lưu dữ liệu - nhiều lần save liên tiếp được gộp thành 1 lần ghi"""
+        self._save_timer.start()
+    
+    def persist_loaded_weeks(self):
+        """Storage lazy: ghi ngay các tuần đang load và đợi ghi xong
+        
+        Gọi sau khi merge 1 tuần trong 1 loạt nhiều tuần (prefetch) - loạt có thể dài hơn
+        LOADED_WEEKS_MAX nên tuần vừa merge phải nằm trên đĩa trước khi tuần sau đẩy nó khỏi bộ nhớ.
+        Storage khác giữ mọi thứ trong bộ nhớ tới lần save(), không cần.
+        """
+        if self.storage.lazy:
+            self._sync_storage()
+    
+    def flush(self):
+        """Ghi ngay mọi thay đổi đang chờ và đợi ghi xong (gọi khi thoát app)"""
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            self._write_snapshot()
+        self.storage.flush()
+        if self.render_cache is not None:
+            self.render_cache.flush()
+    
+    def _week_key(self, date):
+        """Key tuần 'tuanDD/MM/YYYY' (thứ 2 của tuần) cho ngày 'dd/mm/yyyy', '' nếu sai format"""
+        return self._week_key_of(day_number(date))
+    
+    def _week_key_of(self, day_num):
+        """Key tuần 'tuanDD/MM/YYYY' cho số ngày, '' nếu None"""
+        if day_num is None:
+            return ''
+        week = week_number(day_num)
+        week_key = self._week_key_cache.get(week)
+        if week_key is None:
+            year, month, day = day_iso(week_monday(week)).split('-')
+            week_key = self._week_key_cache[week] = f"tuan{day}/{month}/{year}"
+        return week_key
+    
+    def build_snapshot(self):
+        """Tạo dict dữ liệu tổ chức theo tuần (format của DATA_FILE)"""
+        weeks = {}
+        # Block của từng ngày (số ngày -> block tuần) - mỗi ngày chỉ tính key tuần 1 lần
+        blocks = {}
+
+        def block_of(day_num):
+            block = blocks.get(day_num)
+            if block is None:
+                # Nếu parse lỗi, bỏ vào tuần "unknown"
+                week_key = self._week_key_of(day_num) or 'unknown'
+                block = weeks.get(week_key)
+                if block is None:
+                    block = weeks[week_key] = {'schedule': [], 'tasks': []}
+                blocks[day_num] = block
+            return block
+
+        # Phân loại schedule theo tuần
+        for item in self._schedule:
+            date = item.date
+            if type(date) is str and len(date) >= 10:  # dd/mm/yyyy
+                block_of(item.day_num)['schedule'].append(item.to_dict())
+        
+        # Thêm tasks vào tuần chứa ngày của task, task không có date bỏ vào tuần đầu tiên
+        for task in self._tasks.values():
+            if task.day_num is not None:
+                block = block_of(task.day_num)
+            else:
+                week_key = next(iter(weeks), None) or self._week_key(datetime.now().strftime('%d/%m/%Y'))
+                block = weeks.setdefault(week_key, {'schedule': [], 'tasks': []})
+            block['tasks'].append(task.to_dict())
+        
+        # Thêm timestamp
+        weeks['updated'] = datetime.now().isoformat()
+        return weeks
+    
+    def _write_snapshot(self):
+        """Chụp dữ liệu trên UI thread, storage ghi file ở thread nền"""
+        try:
+            self.storage.sync(self.build_snapshot)
+            self.write_render_cache()
+        except Exception as e:
+            pass
+            import traceback
+            traceback.print_exc()
+    
+    def parse_schedule_html(self, html, week_dates=None, auto_save=True, merge_mode=False):
+        """Parse HTML lịch học từ IUH
+        
+        Args:
+            html: HTML content
+            week_dates: Dict map day_idx -> date string (e.g. {0: '03/02/2026', 1: '04/02/2026'})
+            auto_save: Tự động lưu file sau khi parse (mặc định True)
+            merge_mode: Nếu True, merge vào schedule hiện tại thay vì xóa (mặc định False)
+        """
+        # Parse 1 lượt: ngày tháng từ header (nếu chưa có) + các ô lịch, trang đã gặp lấy từ cache
+        if week_dates:
+            items, week_dates = parse_schedule(html, week_dates)
+        else:
+            items, week_dates = parse_schedule_cached(html)
+        if not items:
+            # Không phải trang lịch (lỗi/quá ngắn) -> giữ nguyên schedule hiện tại
+            return 0
+        
+        if merge_mode:
+            # Thay lịch của tuần trên trang, giữ các tuần khác
+            self.merge_week(items, (week_dates or {}).values())
+        else:
+            self._schedule = dict.fromkeys(ScheduleItem(item) for item in items)
+            self.storage.record({'op': 'replace_schedule', 'items': [item.to_dict() for item in self._schedule]})
+            self.rebuild_index()
         
         if auto_save:
             self.save()
             self.data_changed.emit()
-        return len(self.schedule)
+        return len(self._schedule)
     
     def _parse_week_dates_from_html(self, html):
         """Parse ngày tháng của các ngày trong tuần từ header bảng
@@ -350,63 +713,7 @@ class DataManager(QObject):
         Returns:
             Dict {day_idx: 'dd/mm/yyyy'} hoặc None nếu không tìm thấy
         """
-        try:
-            # Tìm header row có các ngày
-            header_pattern = r'<tr[^>]*>(.*?)</tr>'
-            rows = re.findall(header_pattern, html, re.DOTALL)
-            
-            for row_idx, row in enumerate(rows[:5]):  # Chỉ check 5 row đầu
-                # Tìm các cell có dạng "Thứ X (dd/mm)" hoặc "CN (dd/mm)"
-                cells = re.findall(r'<th[^>]*>(.*?)</th>', row, re.DOTALL)
-                if len(cells) < 7:
-                    continue
-                    
-                week_dates = {}
-                date_found = False
-                
-                for idx, cell in enumerate(cells):
-                    cell_text = re.sub(r'<[^>]+>', ' ', cell).strip()  # Thay thẻ HTML bằng khoảng trắng
-                    cell_text = re.sub(r'\s+', ' ', cell_text)  # Gộp nhiều space thành 1
-                    
-                    # Pattern: "Thứ 2 26/01" hoặc "CN 09/02" (sau khi replace <br> bằng space)
-                    date_match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', cell_text)
-                    if not date_match:
-                        # Thử pattern ngắn hơn: (dd/mm) 
-                        date_match = re.search(r'(\d{1,2})/(\d{1,2})', cell_text)
-                    
-                    if date_match:
-                        day = date_match.group(1).zfill(2)
-                        month = date_match.group(2).zfill(2)
-                        
-                        # Lấy năm
-                        if len(date_match.groups()) >= 3:
-                            year = date_match.group(3)
-                        else:
-                            # Lấy năm hiện tại
-                            from datetime import datetime
-                            year = datetime.now().year
-                            
-                            # Nếu tháng nhỏ hơn tháng hiện tại và đang ở cuối năm -> năm sau
-                            current_month = datetime.now().month
-                            if int(month) < current_month and current_month >= 10:
-                                year += 1
-                        
-                        date_str = f"{day}/{month}/{year}"
-                        
-                        # Map vị trí cell với day_idx (bỏ qua cell đầu tiên là "Ca")
-                        if idx > 0:
-                            week_dates[idx - 1] = date_str
-                            date_found = True
-                
-                if date_found and len(week_dates) >= 7:
-                    return week_dates
-            
-            return None
-        except Exception as e:
-            return None
-            import traceback
-            traceback.print_exc()
-            return None
+        return parse_week_dates(html)
     
     def add_task(self, title, day, period, note='', deadline=None, time=None, date=None):
         """Thêm task mới
@@ -427,9 +734,11 @@ class DataManager(QObject):
             monday = today - timedelta(days=days_since_monday)
             target_date = monday + timedelta(days=day)
             date = target_date.strftime('%d/%m/%Y')
+        # Storage lazy: tuần của task phải đang load, nếu không lần ghi sau sẽ đè file tuần chỉ với task này
+        self._ensure_date(date)
         
-        task = {
-            'id': datetime.now().timestamp(),
+        task = Task({
+            'id': new_task_id(),
             'title': title,
             'day': day,
             'period': period,
@@ -439,35 +748,75 @@ class DataManager(QObject):
             'done': False,
             'created': datetime.now().isoformat(),
             'date': date  # THÊM date để task chỉ xuất hiện trong tuần này
-        }
-        self.tasks.append(task)
+        })
+        self._tasks[task['id']] = task
+        self._index_item('task', task)
+        self.storage.record({'op': 'add_task', 'task': task.to_dict()})
         self.save()
-        self.data_changed.emit()
+        self.items_changed.emit([self._change('added', 'task', task)])
         return task
     
     def update_task(self, task_id, **kwargs):
         """Cập nhật task"""
-        for task in self.tasks:
-            if task.get('id') == task_id:
-                task.update(kwargs)
-                break
+        changes = []
+        task = self._tasks.get(task_id)
+        if task is not None:
+            # Load tuần cũ và tuần mới của task trước khi sửa (tuần cũ load trước, không bị đẩy ra)
+            self._ensure_date(task.get('date'))
+            if 'date' in kwargs:
+                self._ensure_date(kwargs['date'])
+            old = self._change('removed', 'task', task)
+            self._unindex_item('task', task)
+            task.update(kwargs)
+            self._index_item('task', task)
+            self.storage.record({'op': 'update_task', 'id': task_id, 'fields': kwargs})
+            new = self._change('added', 'task', task)
+            if (old['date'], old['day'], old['period']) == (new['date'], new['day'], new['period']):
+                new['action'] = 'updated'
+                changes = [new]
+            else:
+                # Task chuyển sang ô khác
+                changes = [old, new]
         self.save()
-        self.data_changed.emit()
+        if changes:
+            self.items_changed.emit(changes)
     
     def delete_task(self, task_id):
         """Xóa task"""
-        self.tasks = [t for t in self.tasks if t.get('id') != task_id]
+        changes = []
+        task = self._tasks.get(task_id)
+        if task is not None:
+            self._ensure_date(task.get('date'))
+        task = self._tasks.pop(task_id, None)
+        self._pinned_tasks.discard(task_id)
+        if task is not None:
+            self._unindex_item('task', task)
+            changes.append(self._change('removed', 'task', task))
+            self.storage.record({'op': 'delete_task', 'id': task_id})
         self.save()
-        self.data_changed.emit()
+        if changes:
+            self.items_changed.emit(changes)
+    
+    def is_task_editable(self, task):
+        """Task sửa/xóa/đánh dấu được không
+        
+        Chỉ task trong dữ liệu chính. Task của tuần cũ đọc từ archive (và ảnh chụp render cache lúc
+        chưa load xong) chỉ để xem - các hàm sửa tìm task theo id trong dữ liệu chính nên sẽ không làm gì.
+        """
+        return self._tasks.get(task.get('id')) is task
     
     def toggle_task(self, task_id):
         """Đánh dấu hoàn thành/chưa hoàn thành"""
-        for task in self.tasks:
-            if task.get('id') == task_id:
-                task['done'] = not task.get('done', False)
-                break
+        changes = []
+        task = self._tasks.get(task_id)
+        if task is not None:
+            self._ensure_date(task.get('date'))
+            task['done'] = not task.get('done', False)
+            self.storage.record({'op': 'toggle_task', 'id': task_id, 'done': task['done']})
+            changes.append(self._change('updated', 'task', task))
         self.save()
-        self.data_changed.emit()
+        if changes:
+            self.items_changed.emit(changes)
     
     def get_items_for_cell(self, day, period, week_dates=None):
         """Lấy tất cả items cho ô [day][period], sắp xếp theo thời gian
@@ -477,61 +826,48 @@ class DataManager(QObject):
             period: Ca (0=sáng, 1=chiều, 2=tối)
             week_dates: Dict {day_idx: 'dd/mm/yyyy'} - Nếu có, chỉ lấy items có date khớp
         """
-        items = []
-        
-        for s in self.schedule:
-            if s.get('day') == day and s.get('period') == period:
-                # Nếu có week_dates, kiểm tra date có khớp không (CHỈ SO SÁNH dd/mm, BỎ QUA năm)
-                if week_dates:
-                    item_date = s.get('date', '')
-                    target_date = week_dates.get(day, '')
-                    
-                    # Lấy phần dd/mm từ cả 2 strings
-                    item_ddmm = item_date[:5] if len(item_date) >= 5 else ''  # "26/01"
-                    target_ddmm = target_date[:5] if len(target_date) >= 5 else ''  # "26/01"
-                    
-                    if item_ddmm != target_ddmm:
-                        continue
-                
-                items.append({'type': 'schedule', 'data': s})
-        
-        for t in self.tasks:
-            if t.get('day') == day and t.get('period') == period:
-                # Kiểm tra date của task nếu có week_dates
-                if week_dates:
-                    task_date = t.get('date', '')
-                    target_date = week_dates.get(day, '')
-                    
-                    # So sánh dd/mm
-                    task_ddmm = task_date[:5] if len(task_date) >= 5 else ''
-                    target_ddmm = target_date[:5] if len(target_date) >= 5 else ''
-                    
-                    if task_ddmm and target_ddmm and task_ddmm != target_ddmm:
-                        continue
-                
-                items.append({'type': 'task', 'data': t})
+        if not week_dates:
+            # Không lọc theo tuần - quét toàn bộ (chỉ dùng khi chưa có week_dates)
+            items = [{'type': 'schedule', 'data': s} for s in self._schedule
+                     if s.get('day') == day and s.get('period') == period]
+            items += [{'type': 'task', 'data': t} for t in self._tasks.values()
+                      if t.get('day') == day and t.get('period') == period]
+            items.sort(key=self._start_time)
+            return items
         
-        def get_start_time(item):
-            if item['type'] == 'task':
-                time_str = item['data'].get('time', '12:00')
-                try:
-                    parts = time_str.split(':')
-                    return int(parts[0]) * 60 + int(parts[1])
-                except:
-                    return 720
-            else:
-                tiet = item['data'].get('tiet', '')
-                tiet_times = {
-                    '1-3': 6 * 60 + 30,
-                    '4-6': 9 * 60,
-                    '7-9': 12 * 60 + 30,
-                    '10-12': 15 * 60,
-                }
-                return tiet_times.get(tiet, 720)
-        
-        items.sort(key=get_start_time)
+        self.ensure_week(week_dates)
+        return self._lookup_cell(day, period, day_number(week_dates.get(day, '')))
+    
+    def _lookup_cell(self, day, period, day_num):
+        """Tra index theo (số ngày, ca) - chỉ tốn O(số items trong ô)"""
+        dated = self._cell_index.get((day_num, period), [])
+        undated = self._undated_tasks.get((day, period), [])
+        archived = self._archived_cells.get((day_num, period))
+        items = [e for e in dated if e['data'].get('day') == day]
+        if undated or archived:
+            extra = undated + [e for e in archived or () if e['data'].get('day') == day]
+            items = sorted(items + extra, key=self._start_time)
         return items
     
+    def get_week(self, week_dates):
+        """Lấy items của cả tuần trong 1 lượt qua index
+        
+        Args:
+            week_dates: Dict {day_idx: 'dd/mm/yyyy'} của tuần cần lấy
+        
+        Returns:
+            List 7x3: week[day][period] = list items đã sắp xếp theo thời gian
+        """
+        if self._cached_week is not None and self._cached_week[0] == week_dates:
+            # Chưa load xong dữ liệu - trả về ảnh chụp (items là dict thuần)
+            return [[list(items) for items in periods] for periods in self._cached_week[1]]
+        self.ensure_week(week_dates)
+        week = []
+        for day in range(len(DAYS)):
+            day_num = day_number(week_dates.get(day, ''))
+            week.append([self._lookup_cell(day, period, day_num) for period in range(len(PERIODS))])
+        return week
+    
     def get_week_dates_from_offset(self, week_offset=0):
         """Tính toán ngày tháng của tuần dựa vào offset
         
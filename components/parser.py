@@ -0,0 +1,397 @@
+"""
+Parser: Đọc trang lịch theo tuần của IUH trong 1 lượt duyệt
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from html import unescape
+
+from .constants import PARSER_RULES_FILE, PARSE_CACHE_FILE, PARSE_CACHE_MAX
+from .storage import atomic_write_json
+
+# Trang nhỏ hơn mức này chắc chắn không có bảng lịch
+MIN_PAGE_LENGTH = 5000
+
+# Chỉ dừng ở các thẻ tạo nên cấu trúc bảng, nội dung ô được cắt nguyên đoạn
+RE_STRUCT_TAG = re.compile(r'<(/?)(tr|td|th|table|script|style)\b[^>]*>|<!--', re.IGNORECASE)
+RE_SCRIPT_END = re.compile(r'</script\s*>', re.IGNORECASE)
+RE_STYLE_END = re.compile(r'</style\s*>', re.IGNORECASE)
+RE_TAG = re.compile(r'<[^>]+>')
+RE_SPACES = re.compile(r'\s+')
+RE_FULL_DATE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+RE_SHORT_DATE = re.compile(r'(\d{1,2})/(\d{1,2})')
+
+# Bộ quy tắc trích xuất mặc định. Khi trang IUH đổi bố cục, đặt file parser_rules.json
+# cạnh app với "version" >= bản này để ghi đè các key cần sửa mà không phải sửa code.
+DEFAULT_RULES = {
+    'version': 1,
+    'error_patterns': ['<title>404', '<title>500', 'page not found', 'server error', '503 service'],
+    'periods': [['Sáng', 0], ['Chiều', 1], ['Tối', 2]],
+    'tiet': r'Tiết\s*:\s*(\d+)\s*[-–]\s*(\d+)',
+    'room': r'Phòng\s*:\s*([A-Z0-9][A-Za-z0-9\.]*)',
+    # Dòng trong ô không phải tên môn: mã lớp, dãy số, nhãn Tiết/Phòng/GV, mã phòng
+    'skip_lines': [
+        r'DH[A-Z0-9]+',
+        r'[\d\s\-–]+$',
+        r'(?i:(?:Tiết|Phòng|GV|Giảng viên)\s*:)',
+        r'[A-Z]\d+\.',
+    ],
+    'min_cell_length': 15,
+    'min_subject_length': 10,
+    # Dòng ngắn toàn chữ hoa đầu (thường là tên GV) chỉ được coi là môn nếu có keyword
+    'short_line_words': 4,
+    'subject_keywords': ['học', 'trình', 'liệu', 'nghệ', 'trúc', 'nhập', 'môn', 'quản', 'phát', 'triển', 'cntt', 'dự án'],
+}
+
+
+class RuleSet:
+    """Bộ quy tắc trích xuất đã compile sẵn (tạo 1 lần khi import)"""
+
+    def __init__(self, spec):
+        self.version = spec['version']
+        # Đổi rules (kể cả cùng version) thì kết quả parse cũ trong cache không còn dùng được
+        spec_json = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+        self.fingerprint = hashlib.sha1(spec_json.encode('utf-8')).hexdigest()[:12]
+        self.error_patterns = tuple(p.lower() for p in spec['error_patterns'])
+        self.periods = tuple((label, int(period)) for label, period in spec['periods'])
+        self.tiet = re.compile(spec['tiet'])
+        self.room = re.compile(spec['room'])
+        # Gộp các pattern bỏ qua thành 1 regex alternation: 1 lần match cho mỗi dòng
+        self.skip_line = re.compile('|'.join(f'(?:{p})' for p in spec['skip_lines']))
+        self.min_cell_length = spec['min_cell_length']
+        self.min_subject_length = spec['min_subject_length']
+        self.short_line_words = spec['short_line_words']
+        # Keyword là chuỗi con (vd 'dự án'), nên dùng 1 regex alternation thay vì set từ
+        self.keywords = frozenset(kw.lower() for kw in spec['subject_keywords'])
+        keywords = sorted(self.keywords, key=len, reverse=True)
+        self.keyword = re.compile('|'.join(re.escape(kw) for kw in keywords)) if keywords else None
+
+    def is_error_page(self, html):
+        lower = html.lower()
+        return any(pattern in lower for pattern in self.error_patterns)
+
+    def period_of(self, text):
+        """Ca học (0/1/2) theo nhãn trong ô đầu hàng, -1 nếu không phải hàng lịch"""
+        for label, period in self.periods:
+            if label in text:
+                return period
+        return -1
+
+    def is_subject(self, line):
+        """Dòng có phải tên môn học không"""
+        if len(line) < self.min_subject_length or self.skip_line.match(line):
+            return False
+        words = line.split()
+        if len(words) <= self.short_line_words and all(w[0].isupper() for w in words):
+            return self.keyword is not None and self.keyword.search(line.lower()) is not None
+        return True
+
+
+def load_rules(path=PARSER_RULES_FILE):
+    """Tạo RuleSet từ DEFAULT_RULES, ghi đè bằng file rules nếu có version >= mặc định"""
+    spec = dict(DEFAULT_RULES)
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                override = json.load(f)
+            if override.get('version', 0) >= DEFAULT_RULES['version']:
+                spec.update(override)
+                return RuleSet(spec)
+    except Exception as e:
+        pass
+    return RuleSet(DEFAULT_RULES)
+
+
+RULES = load_rules()
+
+
+def _cell_chunks(cell_html):
+    """Tách nội dung 1 ô thành các đoạn text nằm giữa các thẻ HTML"""
+    return [unescape(chunk) if '&' in chunk else chunk for chunk in RE_TAG.split(cell_html)]
+
+
+def _scan_rows(html):
+    """Duyệt trang 1 lần, trả về list hàng <tr>, mỗi hàng là list (tag ô 'td'/'th', [đoạn text...])"""
+    rows = []
+    row = None
+    cell_tag = None
+    cell_start = 0
+    pos = 0
+    search = RE_STRUCT_TAG.search
+    while True:
+        m = search(html, pos)
+        if m is None:
+            break
+        pos = m.end()
+        name = m.group(2)
+        if name is None:
+            # Comment: bỏ qua tới '-->'
+            end = html.find('-->', pos)
+            pos = len(html) if end == -1 else end + 3
+            continue
+        name = name.lower()
+        closing = m.group(1) == '/'
+
+        if name in ('script', 'style'):
+            if not closing:
+                end = (RE_SCRIPT_END if name == 'script' else RE_STYLE_END).search(html, pos)
+                pos = len(html) if end is None else end.end()
+            continue
+
+        # Mọi thẻ cấu trúc đều kết thúc ô đang mở
+        if cell_tag is not None:
+            row.append((cell_tag, _cell_chunks(html[cell_start:m.start()])))
+            cell_tag = None
+
+        if name in ('td', 'th'):
+            if not closing and row is not None:
+                cell_tag = name
+                cell_start = pos
+        else:
+            # <tr>, </tr>, <table>, </table> đều kết thúc hàng đang mở
+            if row:
+                rows.append(row)
+            row = [] if (name == 'tr' and not closing) else None
+
+    if cell_tag is not None:
+        row.append((cell_tag, _cell_chunks(html[cell_start:])))
+    if row:
+        rows.append(row)
+    return rows
+
+
+def _week_dates_from_rows(rows):
+    """Tìm hàng header (>= 7 ô <th> có ngày) và trả về {day_idx: 'dd/mm/yyyy'}"""
+    for row in rows[:5]:  # Chỉ check 5 row đầu
+        cells = [chunks for tag, chunks in row if tag == 'th']
+        if len(cells) < 7:
+            continue
+
+        week_dates = {}
+        for idx, chunks in enumerate(cells):
+            # Bỏ qua cell đầu tiên là "Ca"
+            if idx == 0:
+                continue
+            # Pattern: "Thứ 2 26/01/2026" hoặc "CN 09/02"
+            cell_text = ' '.join(chunks)
+            date_match = RE_FULL_DATE.search(cell_text)
+            if date_match:
+                year = date_match.group(3)
+            else:
+                date_match = RE_SHORT_DATE.search(cell_text)
+                if not date_match:
+                    continue
+                # Lấy năm hiện tại, nếu tháng nhỏ hơn tháng hiện tại và đang ở cuối năm -> năm sau
+                now = datetime.now()
+                year = now.year
+                if int(date_match.group(2)) < now.month and now.month >= 10:
+                    year += 1
+            day = date_match.group(1).zfill(2)
+            month = date_match.group(2).zfill(2)
+            week_dates[idx - 1] = f"{day}/{month}/{year}"
+
+        if len(week_dates) >= 7:
+            return week_dates
+    return None
+
+
+def _items_from_rows(rows, week_dates, rules):
+    """Tạo items lịch học từ các hàng có ô đầu là tên ca (Sáng/Chiều/Tối)"""
+    items = []
+    for row in rows:
+        cells = [chunks for tag, chunks in row if tag == 'td']
+        if len(cells) < 2:
+            continue
+
+        period = rules.period_of(''.join(cells[0]))
+        if period == -1:
+            continue
+
+        for day_idx, chunks in enumerate(cells[1:8]):
+            cell_text = RE_SPACES.sub(' ', ' '.join(chunks)).strip()
+            if len(cell_text) < rules.min_cell_length:
+                continue
+
+            cell_clean = '\n'.join(chunks)
+            tiet_matches = rules.tiet.findall(cell_clean)
+            if not tiet_matches:
+                continue
+
+            subject_names = [l for l in (c.strip() for c in cell_clean.split('\n')) if l and rules.is_subject(l)]
+            rooms = rules.room.findall(cell_clean)
+
+            for idx, (tiet_from, tiet_to) in enumerate(tiet_matches):
+                tiet_str = f"{tiet_from}-{tiet_to}"
+
+                if idx < len(subject_names):
+                    subject_name = subject_names[idx]
+                else:
+                    subject_name = subject_names[-1] if subject_names else "Môn học"
+
+                item = {
+                    'raw': f"{subject_name} Tiết:{tiet_str}"[:200],
+                    'day': day_idx,
+                    'period': period,
+                    'subject': subject_name[:60],
+                    'tiet': tiet_str
+                }
+
+                # Thêm ngày tháng nếu có
+                if week_dates and day_idx in week_dates:
+                    item['date'] = week_dates[day_idx]
+
+                if idx < len(rooms):
+                    item['room'] = rooms[idx]
+
+                items.append(item)
+    return items
+
+
+def parse_week_dates(html):
+    """Parse ngày tháng của các ngày trong tuần từ header bảng
+
+    Returns:
+        Dict {day_idx: 'dd/mm/yyyy'} hoặc None nếu không tìm thấy
+    """
+    try:
+        return _week_dates_from_rows(_scan_rows(html))
+    except Exception as e:
+        return None
+
+
+def parse_schedule(html, week_dates=None, rules=None):
+    """Parse trang lịch theo tuần của IUH trong 1 lượt duyệt
+
+    Args:
+        html: HTML content
+        week_dates: Dict {day_idx: 'dd/mm/yyyy'}, nếu None sẽ lấy từ header bảng
+        rules: RuleSet dùng để trích xuất, mặc định RULES
+
+    Returns:
+        (items, week_dates) - items là list dict lịch học, rỗng nếu không phải trang lịch
+    """
+    if len(html) < MIN_PAGE_LENGTH:
+        return [], week_dates
+
+    rules = rules or RULES
+    if rules.is_error_page(html):
+        return [], week_dates
+
+    rows = _scan_rows(html)
+    if not week_dates:
+        week_dates = _week_dates_from_rows(rows)
+    return _items_from_rows(rows, week_dates, rules), week_dates
+
+
+def extract_timetable(html):
+    """Cắt phần bảng lịch (<table> có các ca Sáng/Chiều/Tối) ra khỏi trang"""
+    lower = html.lower()
+    start = lower.find('<table')
+    while start != -1:
+        # Bỏ qua bảng nằm trong comment <!-- ... -->
+        comment = lower.rfind('<!--', 0, start)
+        if comment != -1 and lower.rfind('-->', comment, start) == -1:
+            comment_end = lower.find('-->', start)
+            if comment_end == -1:
+                break
+            start = lower.find('<table', comment_end)
+            continue
+        end = lower.find('</table>', start)
+        if end == -1:
+            break
+        table = lower[start:end]
+        if 'sáng' in table or 'chiều' in table:
+            return html[start:end + len('</table>')]
+        start = lower.find('<table', end)
+    return ''
+
+
+def timetable_hash(html):
+    """Hash của bảng lịch sau khi chuẩn hóa khoảng trắng"""
+    table = RE_SPACES.sub(' ', extract_timetable(html)).strip()
+    return hashlib.sha1(table.encode('utf-8')).hexdigest() if table else None
+
+
+class ParseCache:
+    """Cache kết quả parse trên đĩa (parse_cache.json): hash bảng lịch -> items
+
+    Giữ tối đa max_entries bảng gần nhất, dùng chung giữa các thread fetch.
+    """
+
+    def __init__(self, path=PARSE_CACHE_FILE, max_entries=PARSE_CACHE_MAX):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = OrderedDict()
+            try:
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries.update(json.load(f))
+            except Exception as e:
+                pass
+        return self._entries
+
+    def get(self, key):
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            entries = self._load()
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            try:
+                atomic_write_json(self.path, entries, separators=(',', ':'))
+            except Exception as e:
+                pass
+
+
+parse_cache = ParseCache()
+
+
+def parse_schedule_cached(html, table_hash=None, rules=None, cache=None):
+    """Như parse_schedule (week_dates lấy từ header) nhưng bỏ qua parse nếu bảng lịch đã gặp
+
+    Args:
+        html: HTML content
+        table_hash: timetable_hash(html) nếu đã tính sẵn
+        rules: RuleSet dùng để trích xuất, mặc định RULES
+        cache: ParseCache, mặc định parse_cache
+
+    Returns:
+        (items, week_dates) - items là bản copy, caller được phép sửa
+    """
+    rules = rules or RULES
+    cache = cache or parse_cache
+    table_hash = table_hash or timetable_hash(html)
+    key = f"{rules.fingerprint}:{table_hash}" if table_hash else None
+
+    entry = cache.get(key) if key else None
+    if entry is None:
+        items, week_dates = parse_schedule(html, rules=rules)
+        # Chỉ cache trang lịch hợp lệ - trang lỗi có thể đúng lúc chứa bảng cũ
+        if key and items:
+            cache.put(key, {'items': items, 'week_dates': week_dates})
+            items = [dict(item) for item in items]
+        return items, week_dates
+
+    week_dates = entry.get('week_dates')
+    if week_dates:
+        # JSON lưu key dạng chuỗi
+        week_dates = {int(day): date for day, date in week_dates.items()}
+    return [dict(item) for item in entry['items']], week_dates
@@ -0,0 +1,243 @@
+"""
+Records: Kiểu dữ liệu gọn (__slots__) cho môn học và công việc trong bộ nhớ
+
+Trên đĩa và trong storage vẫn là dict JSON như cũ - DataManager chuyển đổi ở biên
+(ScheduleItem(dict) khi load, to_dict() khi ghi). Các record hỗ trợ get/[]/update như dict
+nên widgets và dialogs dùng được như trước.
+
+Record được tạo/ghi ra hàng nghìn lần mỗi lần load/save nên __init__ và to_dict của từng loại
+viết thẳng từng field (không lặp qua FIELDS + setattr).
+"""
+import os
+import sys
+from operator import attrgetter, itemgetter
+
+from .constants import TIET_TIME
+from .storage import day_number
+
+# Giá trị cho field không có trong dict gốc (khác None: 'deadline': None vẫn phải ghi ra)
+_MISSING = object()
+
+# Giờ bắt đầu mặc định (12:00) cho item không rõ giờ
+DEFAULT_START = 720
+
+
+def new_task_id():
+    """Id mới cho task: 32 ký tự hex ngẫu nhiên (như uuid4().hex), không trùng kể cả khi thêm liên tiếp
+    trong cùng 1 tick đồng hồ. Đọc thẳng os.urandom - đổi id hàng trăm task cũ lúc load không tốn thời gian tạo UUID
+    """
+    return os.urandom(16).hex()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _to_dict(fields, values, extra):
+    """Dict JSON từ giá trị các field (bỏ field _MISSING) + extra"""
+    if _MISSING in values:
+        data = {name: value for name, value in zip(fields, values) if value is not _MISSING}
+    else:
+        data = dict(zip(fields, values))
+    if extra:
+        data.update(extra)
+    return data
+
+
+# Giờ bắt đầu (phút) theo chuỗi tiết - chỉ có vài chục giá trị khác nhau
+_tiet_starts = {}
+
+
+def _tiet_start(tiet):
+    """Giờ bắt đầu (phút trong ngày) của chuỗi tiết '4-6', DEFAULT_START nếu không rõ"""
+    start = _tiet_starts.get(tiet) if type(tiet) is str else DEFAULT_START
+    if start is None:
+        tiet_time = TIET_TIME.get(tiet)
+        start = _tiet_starts[tiet] = tiet_time[0] * 60 + tiet_time[1] if tiet_time else DEFAULT_START
+    return start
+
+
+class _Record:
+    """Record có các field cố định (FIELDS) + dict extra cho key lạ"""
+
+    __slots__ = ('extra',)
+    FIELDS = ()
+    # frozenset(FIELDS) - kiểm tra nhanh dict nguồn có key lạ không
+    _KEYS = frozenset()
+    # attrgetter(*FIELDS) - lấy mọi field trong 1 lần gọi C khi ghi ra dict
+    _values = None
+    # Field có ít giá trị khác nhau (ngày, phòng, ...) - intern để các record dùng chung 1 chuỗi
+    INTERNED = frozenset()
+
+    def __init__(self, data=None):
+        # Bản tổng quát - ScheduleItem/Task viết thẳng từng field cho nhanh
+        data = data or {}
+        for name in self.FIELDS:
+            value = data.get(name, _MISSING)
+            setattr(self, name, _intern(value) if name in self.INTERNED else value)
+        self.extra = self._extra_of(data)
+        self._derive()
+
+    def _set(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, _intern(value) if key in self.INTERNED else value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def _derive(self):
+        """Tính lại các field dẫn xuất (số ngày, giờ bắt đầu) sau khi dữ liệu đổi"""
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._set(key, value)
+        self._derive()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def update(self, other=(), **kwargs):
+        for key, value in dict(other, **kwargs).items():
+            self._set(key, value)
+        self._derive()
+
+    def keys(self):
+        return list(self.to_dict())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def _extra_of(self, data):
+        """Key lạ (ngoài FIELDS) của dict nguồn, giữ nguyên trong extra (None nếu không có)"""
+        if data.keys() <= self._KEYS:
+            return None
+        return {k: v for k, v in data.items() if k not in self._KEYS}
+    
+    def to_dict(self):
+        """Dict JSON đúng format cũ"""
+        return _to_dict(self.FIELDS, self._values(self), self.extra)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class ScheduleItem(_Record):
+    """1 buổi học: subject, tiet, room, date ('dd/mm/yyyy'), day (0-6), period (0-2)
+
+    'raw' (= "{subject} Tiết:{tiet}") được intern như các chuỗi khác - các buổi cùng môn, cùng tiết
+    dùng chung 1 chuỗi. 'tiet' giữ dạng chuỗi '4-6' (key của TIET_TIME, format JSON), giờ bắt đầu
+    tính sẵn thành số phút trong 'start'.
+
+    'full' = True khi record được tạo từ dict có đủ đúng các field (trường hợp thường gặp): to_dict()
+    dựng dict trực tiếp, không phải lọc field thiếu.
+    """
+
+    FIELDS = ('raw', 'day', 'period', 'subject', 'tiet', 'date', 'room')
+    _KEYS = frozenset(FIELDS)
+    INTERNED = frozenset(('raw', 'subject', 'tiet', 'date', 'room'))
+    __slots__ = FIELDS + ('day_num', 'start', 'full')
+    _values = attrgetter(*FIELDS)
+    _items = itemgetter(*FIELDS)
+
+    def __init__(self, data=None):
+        data = data or {}
+        intern = sys.intern
+        if data.keys() == self._KEYS:
+            # Dict đủ đúng các field (dữ liệu đã lưu, kết quả parse): lấy hết trong 1 lần gọi C
+            raw, self.day, self.period, subject, tiet, date, room = self._items(data)
+            self.extra = None
+            self.full = True
+        else:
+            get = data.get
+            raw = get('raw', _MISSING)
+            subject = get('subject', _MISSING)
+            tiet = get('tiet', _MISSING)
+            date = get('date', _MISSING)
+            room = get('room', _MISSING)
+            self.day = get('day', _MISSING)
+            self.period = get('period', _MISSING)
+            self.extra = self._extra_of(data)
+            self.full = False
+        self.raw = intern(raw) if type(raw) is str else raw
+        self.subject = intern(subject) if type(subject) is str else subject
+        self.tiet = intern(tiet) if type(tiet) is str else tiet
+        self.date = intern(date) if type(date) is str else date
+        self.room = intern(room) if type(room) is str else room
+        # = _derive(), viết thẳng để khỏi thêm 1 lần gọi hàm cho mỗi record
+        self.day_num = day_number(date) if type(date) is str else None
+        self.start = _tiet_start(tiet)
+
+    def _derive(self):
+        date = self.date
+        self.day_num = day_number(date) if type(date) is str else None
+        self.start = _tiet_start(self.tiet)
+
+    def _raw(self):
+        subject, tiet = self.subject, self.tiet
+        return f"{'' if subject is _MISSING else subject} Tiết:{'' if tiet is _MISSING else tiet}"[:200]
+
+    def get(self, key, default=None):
+        if key == 'raw' and self.raw is _MISSING:
+            return self._raw()
+        return _Record.get(self, key, default)
+
+    def to_dict(self):
+        if self.full and self.extra is None:
+            return {'raw': self.raw, 'day': self.day, 'period': self.period, 'subject': self.subject,
+                    'tiet': self.tiet, 'date': self.date, 'room': self.room}
+        values = self._values(self)
+        if values[0] is _MISSING:
+            values = (sys.intern(self._raw()),) + values[1:]
+        return _to_dict(self.FIELDS, values, self.extra)
+
+
+class Task(_Record):
+    """1 công việc do người dùng tạo
+
+    'id' là chuỗi từ new_task_id(); dữ liệu cũ dùng timestamp (float) được DataManager đổi id khi load.
+    """
+
+    FIELDS = ('id', 'title', 'day', 'period', 'note', 'time', 'deadline', 'done', 'created', 'date')
+    _KEYS = frozenset(FIELDS)
+    INTERNED = frozenset(('time', 'date'))
+    __slots__ = FIELDS + ('day_num', 'start')
+    _values = attrgetter(*FIELDS)
+
+    def __init__(self, data=None):
+        data = data or {}
+        get = data.get
+        time = get('time', _MISSING)
+        date = get('date', _MISSING)
+        self.id = get('id', _MISSING)
+        self.title = get('title', _MISSING)
+        self.day = get('day', _MISSING)
+        self.period = get('period', _MISSING)
+        self.note = get('note', _MISSING)
+        self.time = sys.intern(time) if type(time) is str else time
+        self.deadline = get('deadline', _MISSING)
+        self.done = get('done', _MISSING)
+        self.created = get('created', _MISSING)
+        self.date = sys.intern(date) if type(date) is str else date
+        self.extra = self._extra_of(data)
+        self._derive()
+
+    def _derive(self):
+        date = self.date
+        self.day_num = day_number(date) if type(date) is str else None
+        try:
+            hour, minute = (self.get('time') or '12:00').split(':')[:2]
+            self.start = int(hour) * 60 + int(minute)
+        except Exception as e:
+            self.start = DEFAULT_START
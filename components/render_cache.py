@@ -0,0 +1,51 @@
+"""
+Render cache: Ảnh chụp nội dung 21 ô của tuần hiện tại để vẽ widget ngay khi khởi động
+
+DataManager ghi file này mỗi lần lưu dữ liệu - items đã chia theo ô và sắp xếp theo giờ đúng như
+get_week() trả về. Lúc khởi động app.py vẽ widget từ file nhỏ này trước rồi mới load toàn bộ dữ liệu,
+nên thời gian tới lần vẽ đầu không phụ thuộc dữ liệu nhiều hay ít.
+"""
+import json
+
+from .constants import RENDER_CACHE_FILE
+from .storage import WriteBehindWriter
+
+# Tăng khi đổi format file - file cũ bị bỏ qua và app load dữ liệu như bình thường
+RENDER_CACHE_VERSION = 1
+
+
+class RenderCache:
+    """File RENDER_CACHE_FILE: {'version', 'dates': [7 ngày 'dd/mm/yyyy'], 'cells': 7x3 list items}"""
+
+    def __init__(self, cache_file=RENDER_CACHE_FILE):
+        self.cache_file = cache_file
+        self._writer = WriteBehindWriter()
+
+    @staticmethod
+    def _dates(week_dates):
+        return [week_dates.get(day) for day in range(7)]
+
+    def load(self, week_dates):
+        """Items 7x3 (dict thuần) đã chụp của tuần week_dates, None nếu không có/khác tuần/lỗi"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != RENDER_CACHE_VERSION or data.get('dates') != self._dates(week_dates):
+                return None
+            week = data['cells']
+            if len(week) != 7 or any(len(cells) != 3 for cells in week):
+                return None
+            return week
+        except Exception as e:
+            return None
+
+    def save(self, week_dates, week):
+        """Chụp items 7x3 của tuần (kết quả DataManager.get_week) và ghi file ở thread nền"""
+        cells = [[[{'type': entry['type'], 'data': entry['data'].to_dict()} for entry in items]
+                  for items in periods] for periods in week]
+        data = {'version': RENDER_CACHE_VERSION, 'dates': self._dates(week_dates), 'cells': cells}
+        self._writer.submit_json(self.cache_file, data, separators=(',', ':'))
+
+    def flush(self):
+        """Chờ lần ghi đang chờ hoàn tất"""
+        self._writer.flush()
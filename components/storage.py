@@ -0,0 +1,635 @@
+"""
+Storage: Ghi file an toàn (atomic) và ghi nền (write-behind) cho dữ liệu lịch
+"""
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+from datetime import date
+
+from .constants import DATA_FILE, DB_FILE, WEEKS_DIR, JOURNAL_COMPACT_EVERY
+
+
+def iso_date(date_str):
+    """Chuyển 'dd/mm/yyyy' -> 'yyyy-mm-dd' ('' nếu sai format)"""
+    parts = date_str.split('/') if date_str else []
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return ''
+    day, month, year = parts
+    return f"{year.zfill(4)}-{month.zfill(2)}-{day.zfill(2)}"
+
+
+# 'dd/mm/yyyy' -> số ngày, mỗi chuỗi ngày chỉ parse 1 lần
+_day_numbers = {}
+
+
+def day_number(date_str):
+    """Chuyển 'dd/mm/yyyy' -> số ngày nguyên (date.toordinal()), None nếu sai format
+
+    Số ngày so sánh/cộng trừ được trực tiếp và không trùng giữa các năm.
+    """
+    day_num = _day_numbers.get(date_str)
+    if day_num is None and date_str:
+        parts = date_str.split('/')
+        if len(parts) != 3 or not all(p.isdigit() for p in parts):
+            return None
+        try:
+            day_num = date(int(parts[2]), int(parts[1]), int(parts[0])).toordinal()
+        except ValueError:
+            return None
+        _day_numbers[date_str] = day_num
+    return day_num
+
+
+def week_number(day_num):
+    """Số tuần của 1 số ngày - ngày 1 (01/01/0001) là thứ 2 nên tuần bắt đầu từ thứ 2"""
+    return (day_num - 1) // 7
+
+
+def week_monday(week):
+    """Số ngày của thứ 2 trong tuần"""
+    return week * 7 + 1
+
+
+def day_iso(day_num):
+    """Số ngày -> 'yyyy-mm-dd'"""
+    return date.fromordinal(day_num).isoformat()
+
+
+def atomic_write_text(path, text):
+    """Ghi text ra file tạm cùng thư mục rồi rename đè lên file thật
+
+    Nếu app crash giữa chừng thì file cũ vẫn còn nguyên vẹn.
+    """
+    atomic_write_bytes(path, text.encode('utf-8'))
+
+
+def atomic_write_bytes(path, data):
+    """Ghi bytes ra file (atomic, xem atomic_write_text)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix=os.path.splitext(path)[1], dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Ghi JSON ra file (atomic, xem atomic_write_text)"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, **dump_kwargs))
+
+
+class WriteBehindWriter:
+    """Ghi file ở thread nền, gộp nhiều lần submit liên tiếp thành 1 lần ghi
+
+    Chỉ bản mới nhất của mỗi file được ghi - các bản cũ chưa kịp ghi bị bỏ qua.
+    """
+
+    def __init__(self):
+        self._pending = {}  # path -> callable ghi file
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread = None
+
+    def submit(self, path, write_fn):
+        """Đặt lịch ghi file path bằng write_fn() ở thread nền"""
+        with self._cond:
+            self._pending[path] = write_fn
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='WriteBehindWriter', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def submit_json(self, path, data, **dump_kwargs):
+        """Đặt lịch ghi JSON (atomic) ở thread nền"""
+        self.submit(path, lambda: atomic_write_json(path, data, **dump_kwargs))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._busy = False
+                    self._cond.notify_all()
+                    self._thread = None
+                    return
+                path, write_fn = self._pending.popitem()
+                self._busy = True
+            try:
+                write_fn()
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+
+    def flush(self, timeout=10):
+        """Chờ tới khi mọi lần ghi đang chờ hoàn tất"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+
+def apply_op(schedule, tasks, op):
+    """Áp dụng 1 bản ghi thay đổi (journal) lên list schedule/tasks, trả về (schedule, tasks)"""
+    kind = op.get('op')
+    if kind == 'add_task':
+        tasks.append(op['task'])
+    elif kind == 'update_task':
+        for task in tasks:
+            if task.get('id') == op['id']:
+                task.update(op.get('fields', {}))
+                break
+    elif kind == 'toggle_task':
+        for task in tasks:
+            if task.get('id') == op['id']:
+                task['done'] = op.get('done', False)
+                break
+    elif kind == 'delete_task':
+        tasks = [t for t in tasks if t.get('id') != op['id']]
+    elif kind == 'merge_schedule':
+        schedule.extend(op.get('items', []))
+    elif kind == 'replace_schedule':
+        schedule = list(op.get('items', []))
+    elif kind == 'replace_days':
+        # Thay các môn của những ngày (ISO) trong op bằng items của op
+        dates = set(op.get('dates', []))
+        schedule = [s for s in schedule if iso_date(s.get('date', '')) not in dates]
+        schedule.extend(op.get('items', []))
+    elif kind == 'archive_before':
+        # Lịch học và task đã xong trước ngày (ISO) này đã chuyển vào archive
+        def archived(item):
+            date_str = item.get('date') or ''
+            return day_number(date_str) is not None and iso_date(date_str) < op['date']
+        schedule = [s for s in schedule if not archived(s)]
+        tasks = [t for t in tasks if not (t.get('done') and archived(t))]
+    return schedule, tasks
+
+
+class JsonStorage:
+    """Lưu toàn bộ dữ liệu vào 1 file JSON tổ chức theo tuần (mặc định)"""
+
+    # True nếu load() chỉ trả về 1 phần dữ liệu, phần còn lại lấy theo tuần qua load_range()
+    lazy = False
+
+    def __init__(self, data_file=DATA_FILE):
+        self.data_file = data_file
+        self._writer = WriteBehindWriter()
+
+    def _read_snapshot(self):
+        """Đọc file dữ liệu, trả về dict ({} nếu không có/lỗi)"""
+        try:
+            if os.path.exists(self.data_file):
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            pass
+        return {}
+
+    @staticmethod
+    def _flatten(data):
+        """Gộp các block tuần của snapshot thành (schedule, tasks)"""
+        # Hỗ trợ cả format cũ (flat) và mới (week-based)
+        if 'schedule' in data:
+            return data.get('schedule', []), data.get('tasks', [])
+        schedule, tasks = [], []
+        for week_key, week_data in data.items():
+            if week_key.startswith('tuan'):
+                schedule.extend(week_data.get('schedule', []))
+                tasks.extend(week_data.get('tasks', []))
+        return schedule, tasks
+
+    def load(self):
+        """Load toàn bộ dữ liệu, trả về (schedule, tasks)"""
+        return self._flatten(self._read_snapshot())
+
+    def record(self, op):
+        """Ghi nhận 1 thay đổi - JSON storage chỉ ghi snapshot nên bỏ qua"""
+        pass
+
+    def sync(self, build_snapshot):
+        """Ghi dữ liệu ra đĩa (ở thread nền)
+
+        Args:
+            build_snapshot: Hàm trả về dict snapshot theo tuần, gọi trên UI thread
+        """
+        self._writer.submit_json(self.data_file, build_snapshot(), separators=(',', ':'))
+
+    def flush(self):
+        """Chờ mọi lần ghi đang chờ hoàn tất"""
+        self._writer.flush()
+
+
+class JournalStorage(JsonStorage):
+    """Ghi thêm (append) từng thay đổi vào file journal, định kỳ gộp vào snapshot
+
+    Mỗi dòng journal là 1 bản ghi JSON có số thứ tự 'seq'. Snapshot lưu 'journal_seq'
+    là seq cuối cùng đã được gộp, nên khi load chỉ replay các bản ghi mới hơn.
+    """
+
+    def __init__(self, data_file=DATA_FILE, journal_file=None, compact_every=JOURNAL_COMPACT_EVERY):
+        super().__init__(data_file)
+        self.journal_file = journal_file or data_file + '.journal'
+        self.compact_every = compact_every
+        self._seq = 0
+        self._journal_count = 0  # Số bản ghi trong journal chưa gộp vào snapshot
+        self._pending_ops = []  # Chưa ghi xuống đĩa (UI thread)
+        self._jobs = []  # (ops, snapshot) chờ thread nền xử lý
+        self._lock = threading.Lock()
+
+    def _read_journal(self):
+        """Đọc các bản ghi trong journal (bỏ qua dòng hỏng do crash giữa chừng)"""
+        ops = []
+        try:
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            ops.append(json.loads(line))
+                        except ValueError:
+                            continue
+        except Exception as e:
+            pass
+        return ops
+
+    def load(self):
+        """Load snapshot rồi replay các thay đổi trong journal"""
+        data = self._read_snapshot()
+        base_seq = data.get('journal_seq', 0) if isinstance(data.get('journal_seq'), int) else 0
+        schedule, tasks = self._flatten(data)
+
+        self._seq = base_seq
+        self._journal_count = 0
+        for op in self._read_journal():
+            seq = op.get('seq', 0)
+            if seq <= base_seq:
+                continue
+            schedule, tasks = apply_op(schedule, tasks, op)
+            self._seq = max(self._seq, seq)
+            self._journal_count += 1
+        return schedule, tasks
+
+    def record(self, op):
+        """Ghi nhận 1 thay đổi, sẽ được append vào journal ở lần sync tới"""
+        self._seq += 1
+        if op.get('op') == 'archive_before':
+            # Dữ liệu vừa nhỏ đi nhiều - gộp vào snapshot ngay ở lần sync tới
+            self._journal_count = max(self._journal_count, self.compact_every)
+        op = dict(op, seq=self._seq)
+        self._pending_ops.append(json.dumps(op, ensure_ascii=False, separators=(',', ':')))
+
+    def sync(self, build_snapshot):
+        """Append các thay đổi mới vào journal, gộp vào snapshot khi journal đủ dài"""
+        ops, self._pending_ops = self._pending_ops, []
+        self._journal_count += len(ops)
+
+        snapshot = None
+        if self._journal_count >= self.compact_every:
+            # Snapshot chụp trên UI thread, chứa mọi thay đổi tới seq hiện tại
+            snapshot = build_snapshot()
+            snapshot['journal_seq'] = self._seq
+            self._journal_count = 0
+
+        if not ops and snapshot is None:
+            return
+        with self._lock:
+            self._jobs.append((ops, snapshot))
+        self._writer.submit(self.journal_file, self._drain)
+
+    def _drain(self):
+        """Chạy ở thread nền: append journal và compact theo thứ tự submit"""
+        with self._lock:
+            jobs, self._jobs = self._jobs, []
+        for ops, snapshot in jobs:
+            if ops:
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(ops) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            if snapshot is not None:
+                self._compact(snapshot)
+
+    def _compact(self, snapshot):
+        """Ghi snapshot mới rồi bỏ các bản ghi journal đã được gộp"""
+        atomic_write_json(self.data_file, snapshot, separators=(',', ':'))
+        base_seq = snapshot['journal_seq']
+        remaining = [op for op in self._read_journal() if op.get('seq', 0) > base_seq]
+        atomic_write_text(self.journal_file, ''.join(
+            json.dumps(op, ensure_ascii=False, separators=(',', ':')) + '\n' for op in remaining))
+
+
+class SqliteStorage:
+    """Lưu dữ liệu vào SQLite, index theo (ngày, ca) - chỉ load tuần đang xem
+
+    Mỗi item được lưu nguyên dạng JSON ở cột data, các cột date_iso/period/day
+    dùng để query. Lần đầu chạy sẽ import từ schedule_data.json nếu DB trống.
+    """
+
+    lazy = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS schedule (
+            id INTEGER PRIMARY KEY,
+            date_iso TEXT NOT NULL,
+            period INTEGER,
+            day INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedule_date_period ON schedule(date_iso, period);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            date_iso TEXT NOT NULL,
+            period INTEGER,
+            day INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_date_period ON tasks(date_iso, period);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file=DB_FILE, json_file=DATA_FILE):
+        self.db_file = db_file
+        self.json_file = json_file
+        self._writer = WriteBehindWriter()
+        self._pending_ops = []
+        self._jobs = []
+        self._lock = threading.Lock()
+        # Dùng chung 1 connection cho UI thread (đọc) và writer thread (ghi), khóa bằng _db_lock
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _task_id(task):
+        return json.dumps(task.get('id'))
+
+    def _insert_schedule(self, items):
+        self._conn.executemany(
+            "INSERT INTO schedule (date_iso, period, day, data) VALUES (?, ?, ?, ?)",
+            [(iso_date(i.get('date', '')), i.get('period'), i.get('day'),
+              json.dumps(i, ensure_ascii=False)) for i in items]
+        )
+
+    def _upsert_task(self, task):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO tasks (id, date_iso, period, day, data) VALUES (?, ?, ?, ?, ?)",
+            (self._task_id(task), iso_date(task.get('date') or ''), task.get('period'), task.get('day'),
+             json.dumps(task, ensure_ascii=False))
+        )
+
+    def import_json(self):
+        """Import 1 lần từ schedule_data.json (format tuanDD/MM/YYYY) nếu DB còn trống"""
+        with self._db_lock, self._conn:
+            if self._conn.execute("SELECT value FROM meta WHERE key = 'imported_json'").fetchone():
+                return
+            schedule, tasks = JsonStorage(self.json_file).load()
+            self._insert_schedule(schedule)
+            for task in tasks:
+                self._upsert_task(task)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_json', '1')")
+
+    def load(self):
+        """Chỉ load tasks không có ngày (hiện ở mọi tuần), các tuần khác load qua load_range()"""
+        self.import_json()
+        return self.load_range('', '')
+
+    def load_range(self, date_from, date_to):
+        """Load items có ngày ISO trong [date_from, date_to] bằng query có index"""
+        with self._db_lock:
+            schedule = [json.loads(row[0]) for row in self._conn.execute(
+                "SELECT data FROM schedule WHERE date_iso BETWEEN ? AND ? ORDER BY id",
+                (date_from, date_to))]
+            tasks = [json.loads(row[0]) for row in self._conn.execute(
+                "SELECT data FROM tasks WHERE date_iso BETWEEN ? AND ? ORDER BY rowid",
+                (date_from, date_to))]
+        return schedule, tasks
+
+    def release(self, monday):
+        """Tuần đã bị bỏ khỏi bộ nhớ - SQLite không cần làm gì"""
+        pass
+
+    def has_data(self):
+        with self._db_lock:
+            return bool(self._conn.execute(
+                "SELECT EXISTS(SELECT 1 FROM schedule) OR EXISTS(SELECT 1 FROM tasks)").fetchone()[0])
+
+    def has_schedule(self, date_from, date_to):
+        """Có môn học nào với ngày ISO trong [date_from, date_to] không (không load items)"""
+        with self._db_lock:
+            return bool(self._conn.execute(
+                "SELECT EXISTS(SELECT 1 FROM schedule WHERE date_iso BETWEEN ? AND ?)",
+                (date_from, date_to)).fetchone()[0])
+
+    def record(self, op):
+        """Ghi nhận 1 thay đổi, được áp dụng vào DB ở lần sync tới"""
+        self._pending_ops.append(json.loads(json.dumps(op)))
+
+    def sync(self, build_snapshot):
+        """Áp dụng các thay đổi vào DB ở thread nền (không cần snapshot)"""
+        ops, self._pending_ops = self._pending_ops, []
+        if not ops:
+            return
+        with self._lock:
+            self._jobs.extend(ops)
+        self._writer.submit(self.db_file, self._drain)
+
+    def _drain(self):
+        with self._lock:
+            ops, self._jobs = self._jobs, []
+        with self._db_lock, self._conn:
+            for op in ops:
+                self._apply(op)
+
+    def _apply(self, op):
+        kind = op.get('op')
+        if kind == 'add_task':
+            self._upsert_task(op['task'])
+        elif kind in ('update_task', 'toggle_task'):
+            row = self._conn.execute("SELECT data FROM tasks WHERE id = ?", (json.dumps(op['id']),)).fetchone()
+            if row:
+                task = json.loads(row[0])
+                if kind == 'update_task':
+                    task.update(op.get('fields', {}))
+                    if task.get('id') != op['id']:
+                        # Đổi id (chuyển id cũ dạng timestamp) - bỏ dòng theo id cũ
+                        self._conn.execute("DELETE FROM tasks WHERE id = ?", (json.dumps(op['id']),))
+                else:
+                    task['done'] = op.get('done', False)
+                self._upsert_task(task)
+        elif kind == 'delete_task':
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (json.dumps(op['id']),))
+        elif kind == 'merge_schedule':
+            self._insert_schedule(op.get('items', []))
+        elif kind == 'replace_schedule':
+            self._conn.execute("DELETE FROM schedule")
+            self._insert_schedule(op.get('items', []))
+        elif kind == 'replace_days':
+            self._conn.executemany("DELETE FROM schedule WHERE date_iso = ?", [(d,) for d in op.get('dates', [])])
+            self._insert_schedule(op.get('items', []))
+
+    def flush(self):
+        self._writer.flush()
+
+
+class WeekFileStorage:
+    """Lưu mỗi tuần 1 file JSON riêng trong WEEKS_DIR, chỉ load tuần đang xem
+
+    Tên file là ngày thứ 2 của tuần (yyyy-mm-dd.json), nên danh sách file chính là
+    index tuần - khởi động không cần đọc lịch sử. Tasks không có ngày nằm ở undated.json.
+    Khi lưu chỉ ghi lại các tuần đang load có nội dung thay đổi.
+    """
+
+    lazy = True
+    UNDATED = 'undated'
+
+    def __init__(self, weeks_dir=WEEKS_DIR, json_file=DATA_FILE):
+        self.weeks_dir = weeks_dir
+        self.json_file = json_file
+        self._writer = WriteBehindWriter()
+        self._week_index = set()  # Các tuần (yyyy-mm-dd) có file
+        self._written = {}  # Tuần đang load -> nội dung JSON đã ghi/đọc gần nhất (None nếu chưa có file)
+
+    def _week_file(self, monday):
+        return os.path.join(self.weeks_dir, f"{monday}.json")
+
+    def _read_week(self, monday):
+        """Đọc 1 file tuần, trả về (text, dict)"""
+        try:
+            with open(self._week_file(monday), 'r', encoding='utf-8') as f:
+                text = f.read()
+            return text, json.loads(text)
+        except (OSError, ValueError):
+            return None, {}
+
+    @staticmethod
+    def _dump_week(week_data):
+        return json.dumps(week_data, ensure_ascii=False, separators=(',', ':'))
+
+    def _split_snapshot(self, snapshot):
+        """Chuyển snapshot 'tuanDD/MM/YYYY' -> {yyyy-mm-dd | UNDATED: {'schedule', 'tasks'}}"""
+        weeks = {}
+        for week_key, week_data in snapshot.items():
+            if not week_key.startswith('tuan'):
+                continue
+            monday = iso_date(week_key[4:])
+            for task in week_data.get('tasks', []):
+                # Theo ngày của chính task (như import_json): task ngày sai (vd 31/02) nằm trong block
+                # tuần đoán được, không được ghi đè lên file của tuần đó
+                key = self._monday_of(task.get('date') or '') or self.UNDATED
+                weeks.setdefault(key, {'schedule': [], 'tasks': []})['tasks'].append(task)
+            if week_data.get('schedule'):
+                weeks.setdefault(monday, {'schedule': [], 'tasks': []})['schedule'].extend(week_data['schedule'])
+        return weeks
+
+    def import_json(self):
+        """Tách schedule_data.json thành các file tuần (chỉ chạy 1 lần)"""
+        if os.path.isdir(self.weeks_dir):
+            return
+        os.makedirs(self.weeks_dir)
+        source = JsonStorage(self.json_file)
+        data = source._read_snapshot()
+        if 'schedule' in data:
+            # Format cũ (flat) - gom hết vào 1 block tuần rồi tách theo ngày
+            data = {'tuan': {'schedule': data.get('schedule', []), 'tasks': data.get('tasks', [])}}
+        weeks = {}
+        for week_key, week_data in data.items():
+            if not week_key.startswith('tuan'):
+                continue
+            for item in week_data.get('schedule', []):
+                monday = self._monday_of(item.get('date', ''))
+                if monday:
+                    weeks.setdefault(monday, {'schedule': [], 'tasks': []})['schedule'].append(item)
+            for task in week_data.get('tasks', []):
+                monday = self._monday_of(task.get('date') or '') or self.UNDATED
+                weeks.setdefault(monday, {'schedule': [], 'tasks': []})['tasks'].append(task)
+        for monday, week_data in weeks.items():
+            atomic_write_text(self._week_file(monday), self._dump_week(week_data))
+
+    @staticmethod
+    def _monday_of(date_str):
+        """Ngày thứ 2 (yyyy-mm-dd) của tuần chứa ngày 'dd/mm/yyyy'"""
+        day_num = day_number(date_str)
+        if day_num is None:
+            return ''
+        return day_iso(week_monday(week_number(day_num)))
+
+    def load(self):
+        """Chỉ đọc danh sách tuần và tasks không có ngày"""
+        self.import_json()
+        self._week_index = {name[:-5] for name in os.listdir(self.weeks_dir)
+                            if name.endswith('.json') and not name.startswith('.')}
+        self._written = {}
+        text, data = self._read_week(self.UNDATED)
+        self._written[self.UNDATED] = text
+        return data.get('schedule', []), data.get('tasks', [])
+
+    def load_range(self, date_from, date_to):
+        """Load file của tuần bắt đầu từ date_from (thứ 2)"""
+        text, data = (None, {})
+        if date_from in self._week_index:
+            text, data = self._read_week(date_from)
+        self._written[date_from] = text
+        return data.get('schedule', []), data.get('tasks', [])
+
+    def release(self, monday):
+        """Tuần đã bị bỏ khỏi bộ nhớ - không theo dõi thay đổi nữa"""
+        self._written.pop(monday, None)
+
+    def has_data(self):
+        return bool(self._week_index)
+
+    def has_schedule(self, date_from, date_to):
+        """File tuần bắt đầu từ date_from (thứ 2) có môn học nào không"""
+        if date_from not in self._week_index:
+            return False
+        return bool(self._read_week(date_from)[1].get('schedule'))
+
+    def record(self, op):
+        """Chỉ ghi các tuần đang load theo snapshot nên bỏ qua"""
+        pass
+
+    def sync(self, build_snapshot):
+        """Ghi lại các tuần đang load có nội dung khác lần ghi trước (ở thread nền)"""
+        weeks = self._split_snapshot(build_snapshot())
+        for monday in set(weeks) | set(self._written):
+            week_data = weeks.get(monday)
+            text = self._dump_week(week_data) if week_data else None
+            if monday in self._written and text == self._written[monday]:
+                continue
+            self._written[monday] = text
+            path = self._week_file(monday)
+            if text is None:
+                # Tuần không còn item nào - xóa file
+                self._week_index.discard(monday)
+                self._writer.submit(path, lambda path=path: os.path.exists(path) and os.remove(path))
+            else:
+                self._week_index.add(monday)
+                self._writer.submit(path, lambda path=path, text=text: atomic_write_text(path, text))
+
+    def flush(self):
+        self._writer.flush()
+
+
+# Các storage engine chọn được qua settings['storage_engine']
+STORAGE_ENGINES = {
+    'json': JsonStorage,
+    'journal': JournalStorage,
+    'sqlite': SqliteStorage,
+    'weeks': WeekFileStorage,
+}
+
+
+def create_storage(settings=None):
+    """Tạo storage engine theo settings (mặc định 'json')"""
+    engine = (settings or {}).get('storage_engine', 'json')
+    return STORAGE_ENGINES.get(engine, JsonStorage)()
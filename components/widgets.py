@@ -2,26 +2,21 @@
 Widgets: ScheduleCell và ScheduleWidget
 """
 import sys
-import ctypes
 from datetime import datetime, timedelta
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFrame, QGridLayout,
     QMenu, QSystemTrayIcon, QSizePolicy, QDialog
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QThreadPool
 from PySide6.QtGui import QCursor
 from PySide6.QtWidgets import QApplication
 
 from .constants import COLORS, DAYS, PERIODS
 from .dialogs import AddTaskDialog
-from .login import LoginWindow
-
-# Logging cho debug
-print("[DEBUG] widgets.py loaded", file=sys.stdout, flush=True)
+from .fetcher import FetchWeekJob, PrefetchJob, save_fetch_states
 
 # Windows API
-user32 = ctypes.windll.user32
 SW_SHOW = 5
 SW_RESTORE = 9
 HWND_TOPMOST = -1
@@ -31,6 +26,198 @@ SWP_SHOWWINDOW = 0x0040
 SWP_NOACTIVATE = 0x0010
 
 
+def _user32():
+    """user32.dll - chỉ load khi gắn widget vào desktop (Windows)"""
+    import ctypes
+    return ctypes.windll.user32
+
+
+class ScheduleCard(QFrame):
+    """Khối hiển thị 1 môn học trong ô - tái sử dụng được khi dữ liệu đổi"""
+    
+    kind = 'schedule'
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._is_online = None
+        
+        schedule_layout = QVBoxLayout(self)
+        schedule_layout.setContentsMargins(5, 4, 5, 4)
+        schedule_layout.setSpacing(3)
+        
+        self.subject_lbl = QLabel()
+        self.subject_lbl.setStyleSheet("""
+            font-size: 11px; 
+            color: #1a472a; 
+            font-weight: bold; 
+            background: transparent;
+            line-height: 1.2;
+        """)
+        self.subject_lbl.setWordWrap(True)
+        self.subject_lbl.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        schedule_layout.addWidget(self.subject_lbl)
+        
+        # Tách tiết và phòng ra 2 phía
+        detail_layout = QHBoxLayout()
+        detail_layout.setContentsMargins(0, 0, 0, 0)
+        detail_layout.setSpacing(5)
+        
+        self.tiet_lbl = QLabel()
+        self.tiet_lbl.setStyleSheet("""
+            font-size: 9px; 
+            color: #555; 
+            background: transparent;
+            font-weight: 600;
+        """)
+        detail_layout.addWidget(self.tiet_lbl)
+        
+        detail_layout.addStretch()
+        
+        self.room_lbl = QLabel()
+        self.room_lbl.setStyleSheet("""
+            font-size: 9px; 
+            color: #555; 
+            background: transparent;
+            font-weight: 600;
+        """)
+        self.room_lbl.setAlignment(Qt.AlignRight)
+        detail_layout.addWidget(self.room_lbl)
+        
+        schedule_layout.addLayout(detail_layout)
+    
+    def set_data(self, data):
+        """Cập nhật nội dung theo item lịch học"""
+        # Kiểm tra nếu phòng là 'Tr' (trực tuyến) thì đổi màu
+        room = data.get('room', '')
+        is_online = room.lower().strip() == 'tr'
+        
+        if is_online != self._is_online:
+            self._is_online = is_online
+            if is_online:
+                # Màu xanh dương nhạt cho lớp trực tuyến
+                self.setStyleSheet("""
+                    QFrame {
+                        background: rgba(66, 165, 245, 0.35);
+                        border: 1px solid rgba(33, 150, 243, 0.4);
+                        border-radius: 4px;
+                        padding: 3px;
+                        margin: 1px 0;
+                    }
+                """)
+            else:
+                self.setStyleSheet("""
+                    QFrame {
+                        background: rgba(255,255,255,0.65);
+                        border: 1px solid rgba(26, 71, 42, 0.15);
+                        border-radius: 4px;
+                        padding: 3px;
+                        margin: 1px 0;
+                    }
+                """)
+        
+        self.subject_lbl.setText(data.get('subject', 'N/A'))
+        
+        tiet = data.get('tiet', '')
+        self.tiet_lbl.setText(f"Tiết {tiet}" if tiet else '')
+        self.tiet_lbl.setVisible(bool(tiet))
+        
+        self.room_lbl.setText(room)
+        self.room_lbl.setVisible(bool(room))
+
+
+class TaskCard(QFrame):
+    """Khối hiển thị 1 công việc trong ô - tái sử dụng được khi dữ liệu đổi"""
+    
+    kind = 'task'
+    
+    def __init__(self, cell):
+        super().__init__(cell)
+        self.cell = cell
+        self.task = None
+        self._done = None
+        
+        self.setCursor(QCursor(Qt.PointingHandCursor))
+        self.setMinimumHeight(28)
+        self.setToolTip("🖱️ Click để xem chi tiết")
+        
+        task_layout = QHBoxLayout(self)
+        task_layout.setContentsMargins(6, 4, 6, 4)
+        task_layout.setSpacing(6)
+        
+        # Icon và giờ bên trái
+        self.left_lbl = QLabel()
+        self.left_lbl.setStyleSheet("""
+            font-size: 9px;
+            font-weight: 600;
+            color: #555;
+            background: transparent;
+        """)
+        task_layout.addWidget(self.left_lbl)
+        
+        # Tên công việc bên phải
+        self.title_lbl = QLabel()
+        self.title_lbl.setStyleSheet("""
+            font-size: 10px;
+            font-weight: bold;
+            color: #333;
+            background: transparent;
+        """)
+        self.title_lbl.setWordWrap(False)
+        self.title_lbl.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        task_layout.addWidget(self.title_lbl, 1)
+    
+    def set_data(self, task):
+        """Cập nhật nội dung theo task"""
+        self.task = task
+        done = bool(task.get('done'))
+        
+        icon = "✅" if done else "📌"
+        time_str = task.get('time', '')
+        self.left_lbl.setText(f"{icon} {time_str}" if time_str else icon)
+        self.title_lbl.setText(task.get('title', ''))
+        
+        # Styling cho container - chỉ set lại khi trạng thái đổi
+        if done != self._done:
+            self._done = done
+            if done:
+                self.setStyleSheet("""
+                    QFrame {
+                        background: rgba(200, 200, 200, 0.6);
+                        border: 1px solid #aaa;
+                        border-radius: 4px;
+                        margin: 1px 0;
+                    }
+                    QFrame:hover {
+                        background: rgba(180, 180, 180, 0.8);
+                        border: 1px solid #888;
+                    }
+                    QLabel {
+                        text-decoration: line-through;
+                        color: #666;
+                    }
+                """)
+            else:
+                self.setStyleSheet("""
+                    QFrame {
+                        background: rgba(255, 193, 7, 0.3);
+                        border: 1px solid #ffc107;
+                        border-radius: 4px;
+                        margin: 1px 0;
+                    }
+                    QFrame:hover {
+                        background: rgba(255, 193, 7, 0.5);
+                        border: 2px solid #e0a800;
+                    }
+                """)
+    
+    def mousePressEvent(self, e):
+        """Mở dialog chi tiết công việc"""
+        if e.button() == Qt.LeftButton:
+            task = self.task
+            # Delay nhỏ để popup cũ đóng hoàn toàn trước khi mở dialog mới
+            QTimer.singleShot(50, lambda: self.cell.show_task_detail(task))
+
+
 class ScheduleCell(QFrame):
     """Một ô trong bảng lịch"""
     
@@ -40,6 +227,9 @@ class ScheduleCell(QFrame):
         self.period = period
         self.data_manager = data_manager
         self.week_dates = None  # Sẽ được set từ parent widget
+        self._fingerprint = None  # Dấu vân tay nội dung đang hiển thị
+        self._style_state = None
+        self._cards = []
         
         self.setMinimumSize(150, 100)
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -49,24 +239,89 @@ class ScheduleCell(QFrame):
         self.layout.setContentsMargins(6, 6, 6, 6)
         self.layout.setSpacing(3)
         
+        # Layout cố định: [nhãn "+"] [các card...] [stretch]
+        self.empty_lbl = QLabel("+")
+        self.empty_lbl.setAlignment(Qt.AlignCenter)
+        self.empty_lbl.setStyleSheet("color: #aaa; font-size: 28px; font-weight: bold;")
+        self.empty_lbl.setAttribute(Qt.WA_TransparentForMouseEvents, True)  # Cho phép event đi qua xuống cell
+        self.empty_lbl.hide()
+        self.layout.addWidget(self.empty_lbl)
+        self.layout.addStretch()
+        
         # Không refresh ở đây - sẽ refresh sau khi set_week_dates()
     
-    def set_week_dates(self, week_dates):
-        """Set ngày tháng của tuần để lọc, sau đó refresh"""
+    def set_week_dates(self, week_dates, items=None):
+        """Set ngày tháng của tuần để lọc, sau đó refresh
+        
+        Args:
+            week_dates: Dict {day_idx: 'dd/mm/yyyy'} của tuần đang hiển thị
+            items: Items của ô nếu đã lấy sẵn (từ DataManager.get_week)
+        """
         self.week_dates = week_dates
-        self.refresh()  # Refresh sau khi có week_dates
+        self.refresh(items)  # Refresh sau khi có week_dates
     
-    def refresh(self):
-        """Cập nhật nội dung ô"""
-        while self.layout.count():
-            child = self.layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        
-        # Lấy items với lọc theo week_dates
-        items = self.data_manager.get_items_for_cell(self.day, self.period, self.week_dates)
+    @staticmethod
+    def _fingerprint_of(items):
+        """Tính dấu vân tay từ các trường được hiển thị của items"""
+        fingerprint = []
+        for item in items:
+            data = item['data']
+            if item['type'] == 'schedule':
+                fingerprint.append(('schedule', data.get('subject'), data.get('tiet'), data.get('room')))
+            else:
+                fingerprint.append(('task', data.get('id'), data.get('title'), data.get('time'), bool(data.get('done'))))
+        return tuple(fingerprint)
+    
+    def refresh(self, items=None):
+        """Cập nhật nội dung ô - bỏ qua nếu nội dung không đổi, tái sử dụng card nếu có thể"""
+        # Lấy items với lọc theo week_dates (nếu chưa được truyền vào)
+        if items is None:
+            items = self.data_manager.get_items_for_cell(self.day, self.period, self.week_dates)
+        
+        fingerprint = self._fingerprint_of(items)
+        if fingerprint == self._fingerprint:
+            # Card task giữ reference tới dict task mới nhất
+            for card, item in zip(self._cards, items):
+                if card.kind == 'task':
+                    card.task = item['data']
+            return
+        self._fingerprint = fingerprint
         
         if not items:
+            self._set_style_state('empty')
+        else:
+            has_class = any(i['type'] == 'schedule' for i in items)
+            self._set_style_state('class' if has_class else 'task')
+        self.empty_lbl.setVisible(not items)
+        
+        # Reconcile: dùng lại card cùng loại ở cùng vị trí, tạo mới nếu khác loại
+        for idx, item in enumerate(items):
+            card = self._cards[idx] if idx < len(self._cards) else None
+            if card is None or card.kind != item['type']:
+                new_card = ScheduleCard(self) if item['type'] == 'schedule' else TaskCard(self)
+                if card is None:
+                    self._cards.append(new_card)
+                else:
+                    self.layout.removeWidget(card)
+                    card.deleteLater()
+                    self._cards[idx] = new_card
+                # Vị trí trong layout: sau nhãn "+" (index 0)
+                self.layout.insertWidget(idx + 1, new_card)
+                card = new_card
+            card.set_data(item['data'])
+        
+        # Xóa các card thừa
+        for card in self._cards[len(items):]:
+            self.layout.removeWidget(card)
+            card.deleteLater()
+        del self._cards[len(items):]
+    
+    def _set_style_state(self, state):
+        """Đổi stylesheet của ô (chỉ khi trạng thái empty/class/task thay đổi)"""
+        if state == self._style_state:
+            return
+        self._style_state = state
+        if state == 'empty':
             self.setStyleSheet(f"""
                 ScheduleCell {{
                     background: {COLORS['empty_bg']};
@@ -77,15 +332,8 @@ class ScheduleCell(QFrame):
                     border: 2px dashed {COLORS['accent']};
                 }}
             """)
-            lbl = QLabel("+")
-            lbl.setAlignment(Qt.AlignCenter)
-            lbl.setStyleSheet("color: #aaa; font-size: 28px; font-weight: bold;")
-            lbl.setAttribute(Qt.WA_TransparentForMouseEvents, True)  # Cho phép event đi qua xuống cell
-            self.layout.addWidget(lbl)
         else:
-            has_class = any(i['type'] == 'schedule' for i in items)
-            bg_color = COLORS['class_bg'] if has_class else COLORS['task_bg']
-            
+            bg_color = COLORS['class_bg'] if state == 'class' else COLORS['task_bg']
             self.setStyleSheet(f"""
                 ScheduleCell {{
                     background: {bg_color};
@@ -93,172 +341,6 @@ class ScheduleCell(QFrame):
                     border-radius: 6px;
                 }}
             """)
-            
-            for item in items:
-                if item['type'] == 'schedule':
-                    schedule_container = QFrame()
-                    
-                    # Kiểm tra nếu phòng là 'Tr' (trực tuyến) thì đổi màu
-                    room = item['data'].get('room', '')
-                    is_online = room.lower().strip() == 'tr'
-                    
-                    if is_online:
-                        # Màu xanh dương nhạt cho lớp trực tuyến
-                        schedule_container.setStyleSheet("""
-                            QFrame {
-                                background: rgba(66, 165, 245, 0.35);
-                                border: 1px solid rgba(33, 150, 243, 0.4);
-                                border-radius: 4px;
-                                padding: 3px;
-                                margin: 1px 0;
-                            }
-                        """)
-                    else:
-                        schedule_container.setStyleSheet("""
-                            QFrame {
-                                background: rgba(255,255,255,0.65);
-                                border: 1px solid rgba(26, 71, 42, 0.15);
-                                border-radius: 4px;
-                                padding: 3px;
-                                margin: 1px 0;
-                            }
-                        """)
-                    schedule_layout = QVBoxLayout(schedule_container)
-                    schedule_layout.setContentsMargins(5, 4, 5, 4)
-                    schedule_layout.setSpacing(3)
-                    
-                    subject = item['data'].get('subject', 'N/A')
-                    subject_lbl = QLabel(subject)
-                    subject_lbl.setStyleSheet("""
-                        font-size: 11px; 
-                        color: #1a472a; 
-                        font-weight: bold; 
-                        background: transparent;
-                        line-height: 1.2;
-                    """)
-                    subject_lbl.setWordWrap(True)
-                    subject_lbl.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-                    schedule_layout.addWidget(subject_lbl)
-                    
-                    # Tách tiết và phòng ra 2 phía
-                    tiet = item['data'].get('tiet', '')
-                    room = item['data'].get('room', '')
-                    
-                    if tiet or room:
-                        detail_layout = QHBoxLayout()
-                        detail_layout.setContentsMargins(0, 0, 0, 0)
-                        detail_layout.setSpacing(5)
-                        
-                        if tiet:
-                            tiet_lbl = QLabel(f"Tiết {tiet}")
-                            tiet_lbl.setStyleSheet("""
-                                font-size: 9px; 
-                                color: #555; 
-                                background: transparent;
-                                font-weight: 600;
-                            """)
-                            detail_layout.addWidget(tiet_lbl)
-                        
-                        detail_layout.addStretch()
-                        
-                        if room:
-                            room_lbl = QLabel(room)
-                            room_lbl.setStyleSheet("""
-                                font-size: 9px; 
-                                color: #555; 
-                                background: transparent;
-                                font-weight: 600;
-                            """)
-                            room_lbl.setAlignment(Qt.AlignRight)
-                            detail_layout.addWidget(room_lbl)
-                        
-                        schedule_layout.addLayout(detail_layout)
-                    
-                    self.layout.addWidget(schedule_container)
-                else:
-                    task = item['data']
-                    
-                    # Tạo container cho task với layout ngang
-                    task_container = QFrame()
-                    task_container.setCursor(QCursor(Qt.PointingHandCursor))
-                    task_container.setMinimumHeight(28)
-                    
-                    task_layout = QHBoxLayout(task_container)
-                    task_layout.setContentsMargins(6, 4, 6, 4)
-                    task_layout.setSpacing(6)
-                    
-                    # Icon và giờ bên trái
-                    icon = "✅" if task.get('done') else "📌"
-                    time_str = task.get('time', '')
-                    left_text = f"{icon} {time_str}" if time_str else icon
-                    
-                    left_lbl = QLabel(left_text)
-                    left_lbl.setStyleSheet("""
-                        font-size: 9px;
-                        font-weight: 600;
-                        color: #555;
-                        background: transparent;
-                    """)
-                    task_layout.addWidget(left_lbl)
-                    
-                    # Tên công việc bên phải
-                    title = task.get('title', '')
-                    title_lbl = QLabel(title)
-                    title_lbl.setStyleSheet("""
-                        font-size: 10px;
-                        font-weight: bold;
-                        color: #333;
-                        background: transparent;
-                    """)
-                    title_lbl.setWordWrap(False)
-                    title_lbl.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                    task_layout.addWidget(title_lbl, 1)
-                    
-                    # Styling cho container
-                    if task.get('done'):
-                        task_container.setStyleSheet("""
-                            QFrame {
-                                background: rgba(200, 200, 200, 0.6);
-                                border: 1px solid #aaa;
-                                border-radius: 4px;
-                                margin: 1px 0;
-                            }
-                            QFrame:hover {
-                                background: rgba(180, 180, 180, 0.8);
-                                border: 1px solid #888;
-                            }
-                            QLabel {
-                                text-decoration: line-through;
-                                color: #666;
-                            }
-                        """)
-                    else:
-                        task_container.setStyleSheet("""
-                            QFrame {
-                                background: rgba(255, 193, 7, 0.3);
-                                border: 1px solid #ffc107;
-                                border-radius: 4px;
-                                margin: 1px 0;
-                            }
-                            QFrame:hover {
-                                background: rgba(255, 193, 7, 0.5);
-                                border: 2px solid #e0a800;
-                            }
-                        """)
-                    
-                    task_container.setToolTip("🖱️ Click để xem chi tiết")
-                    
-                    # Thêm event handler để mở dialog chi tiết
-                    def task_click_handler(e, t=task):
-                        if e.button() == Qt.LeftButton:
-                            # Delay nhỏ để popup cũ đóng hoàn toàn trước khi mở dialog mới
-                            QTimer.singleShot(50, lambda: self.show_task_detail(t))
-                    
-                    task_container.mousePressEvent = task_click_handler
-                    
-                    self.layout.addWidget(task_container)
-        
-        self.layout.addStretch()
     
     def show_task_detail(self, task):
         """Hiện dialog xem chi tiết công việc"""
@@ -342,6 +424,8 @@ class ScheduleCell(QFrame):
             QPushButton:hover { background: #4a8fc4; }
         """)
         edit_btn.clicked.connect(lambda: (dialog.accept(), self.edit_task(task)))
+        # Task của tuần đã lưu trữ chỉ xem được
+        edit_btn.setVisible(self.data_manager.is_task_editable(task))
         btn_layout.addWidget(edit_btn)
         
         close_btn = QPushButton("Đóng")
@@ -452,6 +536,11 @@ class ScheduleCell(QFrame):
             menu.addSeparator()
             
             for task in tasks:
+                if not self.data_manager.is_task_editable(task):
+                    # Task của tuần đã lưu trữ: chỉ xem
+                    archived_action = menu.addAction(f"📦 {task.get('title', 'Task')[:25]} (đã lưu trữ)")
+                    archived_action.setEnabled(False)
+                    continue
                 submenu = menu.addMenu(f"📝 {task.get('title', 'Task')[:25]}")
                 
                 toggle_text = "✅ Hoàn thành" if not task.get('done') else "↩️ Chưa xong"
@@ -468,6 +557,8 @@ class ScheduleCell(QFrame):
     
     def edit_task(self, task):
         """Sửa task"""
+        if not self.data_manager.is_task_editable(task):
+            return
         dialog = AddTaskDialog(self, task.get('day', 0), task.get('period', 0), edit_task=task)
         if dialog.exec():
             data = dialog.get_data()
@@ -484,10 +575,13 @@ class ScheduleWidget(QMainWindow):
         self.cookie_manager = cookie_manager
         self.settings_manager = settings_manager
         self.cells = {}
-        self.login_window = None
+        self._login_session = None  # LoginSession (WebEngine), tạo ở lần đầu cần đăng nhập
         self._manually_hidden = False
         self.tray = None
         self.current_week_offset = 0  # 0=tuần này, 1=tuần sau, -1=tuần trước
+        self._fetch_jobs = {}  # week_offset -> FetchWeekJob đang chạy
+        self._prefetch_job = None
+        self._refresh_job = None
         
         # Window flags - đơn giản, sẽ gắn vào desktop sau
         self.setWindowFlags(
@@ -657,12 +751,14 @@ class ScheduleWidget(QMainWindow):
             
             for col in range(7):
                 cell = ScheduleCell(col, row, self.data_manager, self)
-                cell.set_week_dates(self.current_week_dates)  # Set week dates và auto refresh
                 self.cells[(col, row)] = cell
                 grid.addWidget(cell, row + 1, col + 1)
         
         layout.addLayout(grid)
         
+        # Set week dates và nạp items cho cả 21 ô bằng 1 lần query
+        self.refresh_all_cells()
+        
         # Timer update date
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_date)
@@ -677,17 +773,42 @@ class ScheduleWidget(QMainWindow):
         
         # Connect signals
         self.data_manager.data_changed.connect(self.refresh_all_cells)
+        self.data_manager.items_changed.connect(self.on_items_changed)
         
         # Drag support
         self.drag_pos = None
     
     def refresh_all_cells(self):
         """Refresh tất cả cells với week_dates hiện tại"""
-        # Cập nhật week_dates cho mỗi cell
+        # Cập nhật week_dates cho mỗi cell, lấy items cả tuần trong 1 lần
         self.current_week_dates = self.data_manager.get_week_dates_from_offset(self.current_week_offset)
-        for cell in self.cells.values():
-            cell.set_week_dates(self.current_week_dates)
-            cell.refresh()
+        # Tuần đang hiện không bị bỏ khỏi bộ nhớ khi prefetch/xem các tuần khác (storage lazy)
+        self.data_manager.set_visible_week(self.current_week_dates)
+        week = self.data_manager.get_week(self.current_week_dates)
+        for (day, period), cell in self.cells.items():
+            cell.set_week_dates(self.current_week_dates, week[day][period])
+    
+    def on_items_changed(self, changes):
+        """Chỉ refresh các ô của tuần đang xem bị ảnh hưởng bởi thay đổi"""
+        # Map date -> thứ cho tuần đang hiển thị
+        day_of_date = {date: day for day, date in self.current_week_dates.items()}
+        
+        affected = set()
+        for change in changes:
+            date = change.get('date')
+            if date:
+                day = day_of_date.get(date)
+                if day is None:
+                    continue  # Thay đổi ở tuần khác
+            else:
+                # Task không có date hiện ở mọi tuần
+                day = change.get('day')
+            affected.add((day, change.get('period')))
+        
+        for key in affected:
+            cell = self.cells.get(key)
+            if cell:
+                cell.refresh()
     
     def update_date(self):
         now = datetime.now()
@@ -696,6 +817,8 @@ class ScheduleWidget(QMainWindow):
     def _attach_to_desktop(self):
         """Gắn widget vào desktop layer (WorkerW) để chống Win+D"""
         try:
+            import ctypes
+            user32 = _user32()
             hwnd = int(self.winId())
             
             # Tìm Progman window
@@ -772,6 +895,7 @@ class ScheduleWidget(QMainWindow):
     def _attach_to_desktop(self):
         """Gắn widget vào Progman (desktop) để chống Win+D"""
         try:
+            user32 = _user32()
             hwnd = int(self.winId())
             
             # Lưu vị trí và size
@@ -830,27 +954,63 @@ class ScheduleWidget(QMainWindow):
             import traceback
             traceback.print_exc()
     
+    def login_session(self):
+        """LoginSession dùng chung - tạo ở lần gọi đầu (WebEngine chỉ load khi thật sự cần đăng nhập)"""
+        if self._login_session is None:
+            from .login import LoginSession
+            self._login_session = LoginSession(self.data_manager, self.cookie_manager, self)
+            self._login_session.login_required.connect(self.on_login_required)
+        return self._login_session
+    
     def open_login(self):
         """Mở cửa sổ login"""
-        self.login_window = LoginWindow(
-            self.data_manager, 
-            self.cookie_manager,
-            self.on_login_done
-        )
-        self.login_window.login_required.connect(self.on_login_required)
-        self.login_window.show()
+        self.login_session().open(self.on_login_done)
     
     def refresh_schedule(self):
-        """Refresh lịch học (dùng cookies đã lưu)"""
+        """Refresh lịch học (dùng cookies đã lưu) bằng HTTP thường, không cần WebEngine"""
+        cookies = self.cookie_manager.load_cookies()
+        if not cookies:
+            self.open_login()
+            return
+        if self._refresh_job is not None:
+            return
+        
+        job = FetchWeekJob(0, cookies, self._has_week_schedule(0))
+        job.signals.finished.connect(self.on_headless_refreshed)
+        job.signals.failed.connect(self.on_headless_refresh_failed)
+        self._refresh_job = job
+        QThreadPool.globalInstance().start(job)
+    
+    def on_headless_refreshed(self, result):
+        """Kết quả refresh headless: merge lịch, hoặc mở WebEngine nếu session hết hạn"""
+        self._refresh_job = None
+        if result.get('login_required'):
+            print("⚠️ Session hết hạn, chuyển sang đăng nhập bằng WebEngine...")
+            self.refresh_schedule_webengine()
+            return
+        if result.get('unchanged'):
+            print("⏭️ Lịch không đổi, bỏ qua parse/merge/save")
+            save_fetch_states([result])
+            return
+        if result['status_code'] != 200:
+            print(f"❌ Refresh lỗi HTTP {result['status_code']}")
+            return
+        
+        new_count = self._merge_fetched([result])
+        print(f"✅ Refresh headless: {len(result['items'])} môn, {new_count} môn mới")
+        self.settings_manager.settings['last_successful_fetch'] = datetime.now().isoformat()
+        self.settings_manager.save()
+    
+    def on_headless_refresh_failed(self, week_offset, error):
+        """Lỗi mạng khi refresh headless - thử lại ở lần refresh sau"""
+        self._refresh_job = None
+        print(f"❌ Refresh lỗi: {error}")
+    
+    def refresh_schedule_webengine(self):
+        """Refresh lịch học qua LoginWindow (WebEngine) - dùng khi cookies hết hạn"""
         if self.cookie_manager.has_cookies():
-            self.login_window = LoginWindow(
-                self.data_manager,
-                self.cookie_manager,
-                self.on_login_done,
-                auto_mode=True
-            )
-            self.login_window.login_required.connect(self.on_login_required)
-            self.login_window.show()
+            # Chạy ẩn trên cửa sổ dùng chung - chỉ hiện khi người dùng bấm đăng nhập lại
+            self.login_session().open(self.on_login_done, auto_mode=True, show=False)
         else:
             self.open_login()
     
@@ -868,13 +1028,13 @@ class ScheduleWidget(QMainWindow):
         self.current_week_offset += 1
         self.update_week_label()
         
-        # Fetch và merge data nếu có cookies
-        if self.cookie_manager.has_cookies():
-            self.fetch_and_merge_week(self.current_week_offset)
-        
-        # Cập nhật hiển thị
+        # Cập nhật hiển thị ngay từ dữ liệu local
         self.update_grid_headers()
         self.refresh_all_cells()
+        
+        # Fetch và merge data ở thread nền nếu có cookies
+        if self.cookie_manager.has_cookies():
+            self.fetch_and_merge_week(self.current_week_offset)
     
     def go_current_week(self):
         """Về tuần hiện tại"""
@@ -933,7 +1093,7 @@ class ScheduleWidget(QMainWindow):
                 """)
     
     def fetch_and_merge_week(self, week_offset):
-        """Fetch lịch tuần mới và merge vào data"""
+        """Fetch lịch tuần mới ở thread nền, kết quả được merge trong on_week_fetched"""
         # Load cookies mới
         cookies = self.cookie_manager.load_cookies()
         
@@ -947,11 +1107,9 @@ class ScheduleWidget(QMainWindow):
                 )
             return
         
-        # Import ở đây để tránh circular import
-        from .constants import get_schedule_url_for_week
-        import requests
-        
-        url = get_schedule_url_for_week(week_offset)
+        # Tuần này đang được fetch rồi
+        if week_offset in self._fetch_jobs:
+            return
         
         if self.tray:
             self.tray.showMessage(
@@ -961,85 +1119,123 @@ class ScheduleWidget(QMainWindow):
                 2000
             )
         
-        try:
-            cookies_dict = {c['name']: c['value'] for c in cookies}
-            
-            response = requests.get(url, cookies=cookies_dict, timeout=30)
-            response.encoding = 'utf-8'
-            
-            if response.status_code == 200:
-                # Parse lịch mới với auto_save=False
-                from .managers import DataManager
-                temp_dm = DataManager()
-                
-                # Không load data cũ
-                temp_dm.schedule = []
-                temp_dm.tasks = []
-                
-                # Parse KHÔNG tự động save
-                count = temp_dm.parse_schedule_html(response.text, auto_save=False)
-                
-                if count > 0:
-                    # Merge vào data hiện tại (không xóa lịch cũ)
-                    # Lọc duplicate dựa trên date + subject + tiet
-                    existing_keys = set()
-                    for item in self.data_manager.schedule:
-                        key = (item.get('date', ''), item.get('subject', ''), item.get('tiet', ''), item.get('day', -1))
-                        existing_keys.add(key)
-                    
-                    new_count = 0
-                    for item in temp_dm.schedule:
-                        key = (item.get('date', ''), item.get('subject', ''), item.get('tiet', ''), item.get('day', -1))
-                        if key not in existing_keys:
-                            self.data_manager.schedule.append(item)
-                            existing_keys.add(key)
-                            new_count += 1
-                            print(f"  ➕ New: {item.get('subject', 'N/A')[:30]} - {item.get('date', 'no date')} - {item.get('tiet', 'N/A')}")
-                        else:
-                            print(f"  ⏭️ Skip duplicate: {item.get('subject', 'N/A')[:30]}")
-                    
-                    self.data_manager.save()
-                    self.refresh_cells()
-                    
-                    if self.tray:
-                        self.tray.showMessage(
-                            "IUH Schedule",
-                            f"✅ Đã thêm {new_count} môn học mới\nTổng: {len(self.data_manager.schedule)} môn",
-                            QSystemTrayIcon.Information,
-                            3000
-                        )
-                else:
-                    if self.tray:
-                        self.tray.showMessage(
-                            "IUH Schedule",
-                            "Không tìm thấy lịch cho tuần này",
-                            QSystemTrayIcon.Warning,
-                            3000
-                        )
-            else:
-                if self.tray:
-                    self.tray.showMessage(
-                        "IUH Schedule",
-                        f"Lỗi HTTP {response.status_code}",
-                        QSystemTrayIcon.Critical,
-                        3000
-                    )
-        except Exception as e:
-            pass
-            import traceback
-            traceback.print_exc()
+        job = FetchWeekJob(week_offset, cookies, self._has_week_schedule(week_offset))
+        job.signals.finished.connect(self.on_week_fetched)
+        job.signals.failed.connect(self.on_week_fetch_failed)
+        # Giữ reference tới job để signals không bị thu hồi trước khi kết quả về
+        self._fetch_jobs[week_offset] = job
+        QThreadPool.globalInstance().start(job)
+    
+    def on_week_fetched(self, result):
+        """Merge lịch vừa fetch xong vào data (chạy trên UI thread)"""
+        week_offset = result['week_offset']
+        self._fetch_jobs.pop(week_offset, None)
+        
+        if result.get('unchanged'):
+            print(f"⏭️ Lịch tuần {week_offset} không đổi")
+            save_fetch_states([result])
+            return
+        
+        if result['status_code'] != 200:
             if self.tray:
                 self.tray.showMessage(
                     "IUH Schedule",
-                    f"Lỗi: {str(e)[:50]}",
+                    f"Lỗi HTTP {result['status_code']}",
                     QSystemTrayIcon.Critical,
                     3000
                 )
+            return
+        
+        if not result['items'] and not result.get('dates'):
+            if self.tray:
+                self.tray.showMessage(
+                    "IUH Schedule",
+                    "Không tìm thấy lịch cho tuần này",
+                    QSystemTrayIcon.Warning,
+                    3000
+                )
+            return
+        
+        new_count = self._merge_fetched([result])
+        
+        if self.tray:
+            self.tray.showMessage(
+                "IUH Schedule",
+                f"✅ Đã thêm {new_count} môn học mới\nTổng: {len(self.data_manager.schedule)} môn",
+                QSystemTrayIcon.Information,
+                3000
+            )
+    
+    def _merge_fetched(self, results):
+        """Merge lịch của 1 hoặc nhiều tuần vừa fetch vào data trong 1 lần, trả về số môn mới"""
+        # Từng tuần một (storage lazy chỉ cần giữ tuần đang merge trong bộ nhớ),
+        # các ô bị ảnh hưởng được refresh qua items_changed
+        new_count = 0
+        changed = False
+        for result in results:
+            counts = self.data_manager.merge_week(result['items'], result.get('dates'))
+            if any(counts.values()):
+                print(f"  🔀 Tuần {result['week_offset']}: +{counts['added']} ~{counts['updated']} -{counts['removed']}")
+                changed = True
+                # Khoảng prefetch (-2..+8 = 11 tuần) dài hơn LOADED_WEEKS_MAX: ghi tuần này ngay,
+                # không đợi save() cuối loạt
+                self.data_manager.persist_loaded_weeks()
+            new_count += counts['added']
+        
+        if changed:
+            self.data_manager.save()
+        # ETag/hash chỉ được lưu khi dữ liệu đã merge - lần sau mới được bỏ qua tuần không đổi
+        save_fetch_states(results)
+        return new_count
+    
+    def _has_week_schedule(self, week_offset):
+        """Tuần đã có lịch học trong dữ liệu - chỉ khi đó mới fetch có điều kiện (ETag/hash)"""
+        return self.data_manager.has_week_schedule(self.data_manager.get_week_dates_from_offset(week_offset))
+    
+    def prefetch_weeks(self):
+        """Tải trước song song lịch các tuần trong khoảng cấu hình ở settings"""
+        if self._prefetch_job is not None:
+            return
+        cookies = self.cookie_manager.load_cookies()
+        if not cookies:
+            return
+        
+        settings = self.settings_manager.settings
+        week_offsets = range(settings.get('prefetch_from', -2), settings.get('prefetch_to', 8) + 1)
+        print(f"📥 Tải trước lịch các tuần {week_offsets.start}..{week_offsets.stop - 1}")
+        conditional_offsets = {offset for offset in week_offsets if self._has_week_schedule(offset)}
+        
+        job = PrefetchJob(week_offsets, cookies, conditional_offsets)
+        job.signals.batch_finished.connect(self.on_weeks_prefetched)
+        self._prefetch_job = job
+        QThreadPool.globalInstance().start(job)
+    
+    def on_weeks_prefetched(self, results):
+        """Merge kết quả tải trước: 1 lần merge, 1 lần save"""
+        self._prefetch_job = None
+        ok_results = [r for r in results if r['status_code'] == 200 and (r['items'] or r.get('dates'))]
+        new_count = self._merge_fetched(ok_results)
+        save_fetch_states([r for r in results if r.get('unchanged')])
+        print(f"✅ Tải trước {len(ok_results)}/{len(results)} tuần, {new_count} môn học mới")
+    
+    def on_week_fetch_failed(self, week_offset, error):
+        """Báo lỗi khi fetch thất bại"""
+        self._fetch_jobs.pop(week_offset, None)
+        if self.tray:
+            self.tray.showMessage(
+                "IUH Schedule",
+                f"Lỗi: {error[:50]}",
+                QSystemTrayIcon.Critical,
+                3000
+            )
     
     def auto_refresh_schedule(self):
         """Tự động refresh lịch"""
         print("🔄 Auto-refreshing schedule...")
         self.refresh_schedule()
+        self.prefetch_weeks()
+        # App chạy lâu ngày: tuần cũ dần ra khỏi khoảng giữ lại
+        self.data_manager.apply_retention(self.settings_manager.settings.get('retention_weeks'))
     
     def on_login_required(self):
         """Xử lý khi cần đăng nhập lại (cookies hết hạn)"""